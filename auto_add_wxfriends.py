@@ -4,31 +4,313 @@
 # Add a line under self._show() in the AddNewFriend function: self.SwitchToChat() to add in batches
 #-----------------------------------------------------------------------------------
 
-import pandas as pd
-from wxauto import WeChat
+import argparse
+import csv
+import json
+import os
+import sqlite3
 import time
 import random
+from collections import deque
+from datetime import datetime, timedelta
 
 
-file_path = "List of people to be added.xlsx"  # Replace with your actual path
-df = pd.read_excel(file_path, engine='openpyxl')
+file_path = "List of people to be added.xlsx"  # Replace with your actual path (.xlsx or .csv)
+journal_path = "add_friends_journal.db"         # Progress journal (one per account, suffixed with its name)
+addmsg = "Hello，xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"   # The verification message sent when adding a friend has a character limit.
+RETRY_STATUSES = ("error",)                     # Outcomes that are attempted again on the next run
+contacts_cache_path = "existing_contacts.csv"   # Optional export of existing contacts (needs a 'phone' column)
+rejects_path = "rejects.csv"                    # Rows dropped by the pre-check, with the reason
+PHONE_PATTERN = r"1[3-9]\d{9}"                  # Mainland China mobile numbers after normalization
+CHUNK_ROWS = 5000                               # Rows validated per pandas batch
 
-# Initialize WeChat
-wx = WeChat()
+# Pacing: a token bucket whose refill interval adapts to the recent failure rate
+metrics_path = "add_metrics.csv"                # Per-add latency and outcome log (one per account)
+DAILY_QUOTA = 150                               # Max add attempts per account per day (counted from its metrics file)
+ACTIVE_HOURS = (9, 22)                          # Only add between these local hours [start, end)
+START_INTERVAL = 8                              # Initial seconds between adds (the old fixed sleep averaged 8 s)
+MIN_INTERVAL = 6                                # Fastest pace after a run of successes
+MAX_INTERVAL = 300                              # Slowest pace when failures pile up
+BURST = 2                                       # Token bucket capacity
+FAILURE_WINDOW = 10                             # Recent outcomes used to compute the failure rate
+SLOW_DOWN_FAILURE_RATE = 0.3                    # Back off when the recent failure rate is above this
 
+# Accounts: each entry is one logged-in WeChat client. "options" are passed to WeChat(),
+# "daily_quota" overrides DAILY_QUOTA for that account. Rows are handed out to whichever account is free next.
+ACCOUNTS = [
+    {"name": "main"},
+]
+STALL_ERRORS = 3                                # Consecutive errors before an account is considered stalled
+DRY_RUN_SUFFIX = "_dryrun"                      # --fake runs keep their journals and metrics apart from real ones
+# An account is also considered stalled once every add in the last FAILURE_WINDOW failed (e.g. hit WeChat's own limit)
 
-# Traverse each row of data
-for index, row in df.iterrows():
+
+def cell_text(value):
+    """Convert a spreadsheet cell to a stripped string ('' for empty cells)"""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return ""
+        if value.is_integer():  # Phone numbers stored as numbers come back as 13800000000.0
+            value = int(value)
+    return str(value).strip()
+
+
+def iter_rows(path):
+    """Stream the list row by row as dicts keyed by the header row, without loading the whole sheet"""
+    if path.lower().endswith(".csv"):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            for row_number, row in enumerate(csv.DictReader(f), start=2):
+                yield row_number, row
+        return
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
     try:
-        # Extracting information
-        phone = str(row['phone']).strip()
-        addmsg = "Hello，xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"                       # The verification message sent when adding a friend has a character limit.
-        remark = str(row['remark']).strip() if pd.notna(row['remark']) else None   # Note: You can set it in advance in the Excel list to be added
-        raw_tags = str(row['tag']).strip() if pd.notna(row['tag']) else ""         # Friend tags can be set in advance in the Excel list to be added
-        tags = [tag.strip() for tag in raw_tags.split(",") if tag.strip()]
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [cell_text(name) for name in next(rows, ())]
+        for row_number, values in enumerate(rows, start=2):
+            if values is None or all(v is None for v in values):
+                continue
+            yield row_number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def normalize_phones(phones):
+    """Vectorized phone cleanup: float-parsed cells, separators and +86/0086/86 prefixes"""
+    import pandas as pd
+
+    text = phones.astype("string").fillna("").str.strip()
+    text = text.str.replace(r"\.0+$", "", regex=True)                 # 13800000000.0 -> 13800000000
+    text = text.str.replace(r"[\s\-()（）]", "", regex=True)
+    text = text.str.replace(r"^(?:\+|00)?86(?=1\d{10}$)", "", regex=True)
+    return text.astype(object).where(text != "", pd.NA)
+
+
+def load_contact_phones(path):
+    """Phones of existing contacts from a cached export, normalized the same way as the list"""
+    import pandas as pd
+
+    if not os.path.exists(path):
+        return set()
+    contacts = pd.read_csv(path, dtype=str, usecols=["phone"])
+    return set(normalize_phones(contacts["phone"]).dropna())
+
+
+def prevalidate(path, journals):
+    """Check the whole list in bulk before the slow add loop.
+
+    Valid, unique, not-yet-added rows are written to a side CSV that the add loop streams;
+    everything else goes to the rejects file with a reason. Returns (validated path, counts)."""
+    import pandas as pd
+
+    validated_path = os.path.splitext(path)[0] + ".validated.csv"
+    known = load_contact_phones(contacts_cache_path)
+    finished = set().union(*(journal.finished_phones() for journal in journals))
+    seen = set()
+    counts = {"valid": 0}
+
+    def batches():
+        batch = []
+        for row_number, row in iter_rows(path):
+            batch.append(dict(row, _row=row_number))
+            if len(batch) >= CHUNK_ROWS:
+                yield pd.DataFrame(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch)
+
+    header_written = {"valid": False, "rejects": False}
+    with open(validated_path, "w", encoding="utf-8-sig", newline="") as valid_file, \
+            open(rejects_path, "w", encoding="utf-8-sig", newline="") as rejects_file:
+        for df in batches():
+            for column in ("phone", "remark", "tag"):
+                if column not in df:
+                    df[column] = pd.NA
+            df["phone_raw"] = df["phone"]
+            df["phone"] = normalize_phones(df["phone"])
+
+            reason = pd.Series(pd.NA, index=df.index, dtype=object)
+            reason[df["phone"].isna()] = "empty"
+            invalid = df["phone"].notna() & ~df["phone"].fillna("").str.fullmatch(PHONE_PATTERN)
+            reason[reason.isna() & invalid] = "invalid_format"
+            reason[reason.isna() & (df["phone"].duplicated() | df["phone"].isin(seen))] = "duplicate_in_list"
+            reason[reason.isna() & df["phone"].isin(known)] = "existing_contact"
+            reason[reason.isna() & df["phone"].isin(finished)] = "finished_in_earlier_run"
+
+            ok = reason.isna()
+            seen.update(df.loc[df["phone"].notna(), "phone"])
+
+            valid = df.loc[ok, ["_row", "phone", "remark", "tag"]]
+            valid.to_csv(valid_file, index=False, header=not header_written["valid"])
+            header_written["valid"] = True
+            counts["valid"] += len(valid)
+
+            rejects = df.loc[~ok, ["_row", "phone_raw", "phone"]].assign(reason=reason[~ok])
+            if len(rejects):
+                rejects.to_csv(rejects_file, index=False, header=not header_written["rejects"])
+                header_written["rejects"] = True
+                for name, count in rejects["reason"].value_counts().items():
+                    counts[name] = counts.get(name, 0) + int(count)
+
+    return validated_path, counts
+
+
+class PacingScheduler:
+    """Token bucket pacing for AddNewFriend with a daily quota and an active-hours window.
+
+    The refill interval grows when recent adds fail (WeChat reports throttling as a failed add)
+    and shrinks again while adds succeed."""
+
+    def __init__(self, used_today=0, daily_quota=None, active_hours=None, clock=time.time):
+        self.daily_quota = DAILY_QUOTA if daily_quota is None else daily_quota
+        self.active_hours = ACTIVE_HOURS if active_hours is None else active_hours
+        self.interval = START_INTERVAL
+        self.used_today = used_today
+        self.recent = []
+        self.clock = clock
+        self.tokens = 1.0
+        self.last_refill = clock()
+        self.day = datetime.fromtimestamp(self.last_refill).date()
+
+    def quota_left(self):
+        self._roll_day()
+        return max(self.daily_quota - self.used_today, 0)
 
+    def seconds_until_slot(self):
+        """Seconds until the next add may start (0 = now), or None once today's quota is used up"""
+        if self.quota_left() <= 0:
+            return None
+        pause = self._seconds_until_active()
+        if pause > 0:
+            return pause
+        self._refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) * self.interval
+
+    def take(self):
+        """Consume the slot reported free by seconds_until_slot()"""
+        self.tokens -= 1
+        self.used_today += 1
+
+    def outside_active_hours(self):
+        return self._seconds_until_active() > 0
+
+    def record(self, ok):
+        """Feed an add outcome back into the pace"""
+        self.recent = (self.recent + [ok])[-FAILURE_WINDOW:]
+        failure_rate = self.recent.count(False) / len(self.recent)
+        if not ok and failure_rate > SLOW_DOWN_FAILURE_RATE:
+            self.interval = min(self.interval * 1.5, MAX_INTERVAL)
+            self.tokens = min(self.tokens, 0.0)  # drop any saved burst while backing off
+        elif ok and failure_rate <= SLOW_DOWN_FAILURE_RATE:
+            self.interval = max(self.interval * 0.9, MIN_INTERVAL)
+
+    def failure_rate(self):
+        return self.recent.count(False) / len(self.recent) if self.recent else 0.0
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(BURST, self.tokens + (now - self.last_refill) / self.interval)
+        self.last_refill = now
+
+    def _roll_day(self):
+        today = datetime.fromtimestamp(self.clock()).date()
+        if today != self.day:
+            self.day = today
+            self.used_today = 0
+
+    def _seconds_until_active(self):
+        start_hour, end_hour = self.active_hours
+        now = datetime.fromtimestamp(self.clock())
+        if start_hour <= now.hour < end_hour:
+            return 0
+        start = now.replace(hour=start_hour, minute=0, second=0, microsecond=0)
+        if now.hour >= end_hour:
+            start += timedelta(days=1)
+        return max((start - now).total_seconds(), 1)
+
+
+class AddMetrics:
+    """Appends one CSV line per add and summarizes success rate, throughput and ETA"""
+
+    FIELDS = ["timestamp", "phone", "outcome", "latency_s", "interval_s"]
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.start = clock()
+        self.outcomes = {}
+        self.latencies = []
+        new_file = not os.path.exists(path)
+        self.file = open(path, "a", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file)
+        if new_file:
+            self.writer.writerow(self.FIELDS)
+
+    @staticmethod
+    def attempts_today(path):
+        """Add attempts already made today, so the daily quota survives restarts"""
+        if not os.path.exists(path):
+            return 0
+        today = datetime.now().strftime("%Y-%m-%d")
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return sum(1 for row in csv.DictReader(f) if row.get("timestamp", "").startswith(today))
+
+    def record(self, phone, outcome, latency, interval):
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        self.latencies.append(latency)
+        self.writer.writerow([datetime.fromtimestamp(self.clock()).strftime("%Y-%m-%d %H:%M:%S"),
+                              phone, outcome, f"{latency:.2f}", f"{interval:.1f}"])
+        self.file.flush()
+
+    def attempts(self):
+        return sum(self.outcomes.values())
+
+    def adds_per_hour(self):
+        hours = (self.clock() - self.start) / 3600
+        return self.outcomes.get("added", 0) / hours if hours > 0 else 0.0
+
+    def eta(self, remaining):
+        """Seconds left for `remaining` rows at the pace observed so far"""
+        attempts = self.attempts()
+        if not attempts:
+            return None
+        return (self.clock() - self.start) / attempts * remaining
+
+    def summary(self, remaining=0, quota=None):
+        attempts = self.attempts()
+        added = self.outcomes.get("added", 0)
+        lines = [f"Attempts: {attempts}  Outcomes: {self.outcomes}"]
+        if attempts:
+            lines.append(f"Success rate: {added / attempts:.0%}  "
+                         f"Avg AddNewFriend latency: {sum(self.latencies) / len(self.latencies):.1f}s  "
+                         f"Adds/hour: {self.adds_per_hour():.1f}")
+        eta = self.eta(remaining)
+        if remaining and eta is not None:
+            days = f", about {remaining / quota:.1f} days at the daily quota" if quota else ""
+            lines.append(f"Remaining rows: {remaining}  ETA: {eta / 3600:.1f}h of active time{days}")
+        return "\n".join(lines)
+
+    def close(self):
+        self.file.close()
+
+
+def add_one(wx, row, journal, clock=time.time):
+    """Send one friend request and journal the outcome. Returns (outcome, latency)."""
+    row_number = row.get('_row')
+    # Extracting information
+    phone = cell_text(row.get('phone'))
+    remark = cell_text(row.get('remark')) or None   # Note: You can set it in advance in the Excel list to be added
+    raw_tags = cell_text(row.get('tag'))             # Friend tags can be set in advance in the Excel list to be added
+    tags = [tag.strip() for tag in raw_tags.split(",") if tag.strip()]
+
+    start_time = clock()
+    try:
         # Try adding friends
-        start_time = time.time()
         success = wx.AddNewFriend(
             keywords=phone,
             addmsg=addmsg,
@@ -38,13 +320,303 @@ for index, row in df.iterrows():
 
         # Determine the result based on the return value
         if success:
+            journal.record(phone, "added", remark, tags)
             print(f"✅ Successfully added:{phone}")
+            outcome = "added"
         else:
+            journal.record(phone, "failed", remark, tags, "AddNewFriend returned False")
             print(f"❌ Add failed: {phone} (The phone number information is incorrect and cannot be added)")
-        
-        # Avoid frequent operations
-        time.sleep(5 + random.uniform(1, 5))  
+            outcome = "failed"
 
     except Exception as e:
-        print(f"❌ Failed to add: {phone}, error: {str(e)}")
-        continue
+        journal.record(phone, "error", remark, tags, str(e))
+        print(f"❌ Failed to add: {phone} (row {row_number}), error: {str(e)}")
+        outcome = "error"
+
+    return outcome, clock() - start_time
+
+
+class Journal:
+    """SQLite record of the outcome for every phone number, so an interrupted run can resume"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS adds (
+                   phone      TEXT PRIMARY KEY,
+                   status     TEXT NOT NULL,
+                   remark     TEXT,
+                   tags       TEXT,
+                   detail     TEXT,
+                   attempts   INTEGER NOT NULL DEFAULT 0,
+                   updated_at TEXT NOT NULL
+               )"""
+        )
+        self.conn.commit()
+
+    def is_done(self, phone):
+        row = self.conn.execute("SELECT status FROM adds WHERE phone = ?", (phone,)).fetchone()
+        return row is not None and row[0] not in RETRY_STATUSES
+
+    def record(self, phone, status, remark=None, tags=(), detail=None):
+        # Committed immediately so a crash never loses a finished row
+        self.conn.execute(
+            """INSERT INTO adds (phone, status, remark, tags, detail, attempts, updated_at)
+               VALUES (?, ?, ?, ?, ?, 1, ?)
+               ON CONFLICT(phone) DO UPDATE SET
+                   status = excluded.status, remark = excluded.remark, tags = excluded.tags,
+                   detail = excluded.detail, attempts = attempts + 1, updated_at = excluded.updated_at""",
+            (phone, status, remark, ",".join(tags), detail, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+        self.conn.commit()
+
+    def requeue(self, phone, detail):
+        """Mark a finished phone as retryable again (e.g. it only failed because the account hit a limit)"""
+        self.conn.execute("UPDATE adds SET status = ?, detail = ? WHERE phone = ?", (RETRY_STATUSES[0], detail, phone))
+        self.conn.commit()
+
+    def finished_phones(self):
+        placeholders = ",".join("?" * len(RETRY_STATUSES))
+        rows = self.conn.execute(f"SELECT phone FROM adds WHERE status NOT IN ({placeholders})", RETRY_STATUSES)
+        return {phone for (phone,) in rows}
+
+    def summary(self):
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM adds GROUP BY status").fetchall())
+
+    def close(self):
+        self.conn.close()
+
+
+class SimClock:
+    """Virtual clock for dry runs against the fake client: sleeping just advances time"""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0)
+
+
+class Account:
+    """One WeChat client with its own journal, pacing budget and metrics"""
+
+    def __init__(self, config, clock=time.time, dry_run=False):
+        self.name = config["name"]
+        self.options = config.get("options", {})
+        suffix = f"_{self.name}"
+        journal_file = config.get("journal") or os.path.splitext(journal_path)[0] + suffix + ".db"
+        metrics_file = config.get("metrics") or os.path.splitext(metrics_path)[0] + suffix + ".csv"
+        if dry_run:
+            journal_file = DRY_RUN_SUFFIX.join(os.path.splitext(journal_file))
+            metrics_file = DRY_RUN_SUFFIX.join(os.path.splitext(metrics_file))
+        self.journal = Journal(journal_file)
+        self.pacer = PacingScheduler(used_today=AddMetrics.attempts_today(metrics_file),
+                                     daily_quota=config.get("daily_quota"), clock=clock)
+        self.metrics = AddMetrics(metrics_file, clock=clock)
+        self.recent_rows = deque(maxlen=max(FAILURE_WINDOW, STALL_ERRORS))   # (row, outcome) of the last adds
+        self.wx = None
+        self.stop_reason = None
+        self.consecutive_errors = 0
+
+    @property
+    def active(self):
+        return self.stop_reason is None
+
+    def connect(self):
+        from wxauto import WeChat
+        try:
+            self.wx = WeChat(**self.options)
+        except Exception as e:
+            self.stop_reason = f"connect failed: {e}"
+            print(f"❌ [{self.name}] Could not attach to WeChat: {str(e)}")
+
+    def close(self):
+        self.metrics.close()
+        self.journal.close()
+
+
+class Coordinator:
+    """Streams the validated rows to several accounts and interleaves their adds on one thread.
+
+    UI automation can only drive one window at a time, so accounts take turns: whichever account's
+    pacer frees a slot first takes the next row. An account that hits its quota or stalls simply
+    stops taking rows; the rows it could not finish are queued for the others."""
+
+    def __init__(self, accounts, rows, total, clock=time.time, sleep=time.sleep):
+        self.accounts = accounts
+        self.rows = rows                # iterator over the validated rows, read one at a time
+        self.pending = total            # rows not yet taken from the iterator
+        self.retry = deque()            # rows handed back by stalled accounts
+        self.clock = clock
+        self.sleep = sleep
+        self.start = clock()
+        self.skipped = 0
+
+    def next_row(self):
+        if self.retry:
+            return self.retry.popleft()
+        row = next(self.rows, None)
+        if row is not None:
+            self.pending -= 1
+        return row
+
+    def stop(self, account, reason, requeue=0):
+        """Take an account out of rotation and hand its last `requeue` unfinished rows to the others"""
+        account.stop_reason = reason
+        rows = [(row, outcome) for row, outcome in list(account.recent_rows)[-requeue:] if outcome != "added"] \
+            if requeue else []
+        for row, outcome in rows:
+            if outcome != RETRY_STATUSES[0]:
+                account.journal.requeue(cell_text(row.get('phone')), f"requeued: {reason}")
+            self.retry.append(row)
+        print(f"⚠️ [{account.name}] stopped ({reason}), {len(rows)} rows handed to the other accounts")
+
+    def remaining(self):
+        return self.pending + len(self.retry)
+
+    def run(self):
+        announced_pause = False
+        while self.remaining():
+            waits = []
+            for account in self.accounts:
+                if not account.active:
+                    continue
+                wait = account.pacer.seconds_until_slot()
+                if wait is None:
+                    self.stop(account, f"daily quota of {account.pacer.daily_quota} reached")
+                    continue
+                waits.append((wait, account))
+            if not waits:
+                return
+
+            wait, account = min(waits, key=lambda item: item[0])
+            if wait > 0:
+                if account.pacer.outside_active_hours() and not announced_pause:
+                    print(f"⏸ Outside active hours {ACTIVE_HOURS}, sleeping {wait / 60:.0f} min")
+                    announced_pause = True
+                # ±20% jitter so the adds do not land on a perfectly regular beat
+                self.sleep(wait * random.uniform(0.8, 1.2))
+                continue
+            announced_pause = False
+
+            row = self.next_row()
+            if row is None:
+                return
+            phone = cell_text(row.get('phone'))
+            if not phone or account.journal.is_done(phone):
+                self.skipped += 1
+                continue
+
+            account.pacer.take()
+            outcome, latency = add_one(account.wx, row, account.journal, self.clock)
+            account.pacer.record(outcome == "added")
+            account.metrics.record(phone, outcome, latency, account.pacer.interval)
+            account.recent_rows.append((row, outcome))
+
+            account.consecutive_errors = account.consecutive_errors + 1 if outcome == "error" else 0
+            if account.consecutive_errors >= STALL_ERRORS:
+                self.stop(account, f"{STALL_ERRORS} errors in a row", requeue=STALL_ERRORS)
+            elif len(account.pacer.recent) >= FAILURE_WINDOW and account.pacer.failure_rate() == 1.0:
+                # Most likely WeChat's own limit: these rows never really got a chance
+                self.stop(account, f"last {FAILURE_WINDOW} adds all failed", requeue=FAILURE_WINDOW)
+
+            attempts = self.attempts()
+            if attempts % 10 == 0:
+                eta = self.eta()
+                print(f"… {attempts} attempts, {self.remaining()} rows left, {self.adds_per_hour():.1f} adds/hour, "
+                      f"ETA {eta / 3600 if eta else 0:.1f}h")
+
+    def attempts(self):
+        return sum(a.metrics.attempts() for a in self.accounts)
+
+    def eta(self):
+        """Seconds left for the remaining rows at the combined pace observed so far"""
+        attempts = self.attempts()
+        if not attempts:
+            return None
+        return (self.clock() - self.start) / attempts * self.remaining()
+
+    def adds_per_hour(self):
+        hours = (self.clock() - self.start) / 3600
+        added = sum(a.metrics.outcomes.get("added", 0) for a in self.accounts)
+        return added / hours if hours > 0 else 0.0
+
+    def report(self):
+        lines = []
+        for a in self.accounts:
+            lines.append(f"[{a.name}] {a.stop_reason or 'ok'}  Journal: {a.journal.summary()}\n" + a.metrics.summary())
+        quota = sum(a.pacer.daily_quota for a in self.accounts if a.wx is not None)
+        remaining = self.remaining()
+        line = (f"Total: {self.adds_per_hour():.1f} adds/hour across {len(self.accounts)} accounts, "
+                f"skipped {self.skipped}, {remaining} rows left")
+        eta = self.eta()
+        if remaining and eta is not None:
+            line += f", ETA {eta / 3600:.1f}h of active time"
+            if quota:
+                line += f", about {remaining / quota:.1f} days at the combined quota"
+        lines.append(line)
+        return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-add WeChat friends from a list")
+    parser.add_argument("--accounts", help="JSON file with the account list (overrides ACCOUNTS)")
+    parser.add_argument("--fake", action="store_true",
+                        help="Use the fake_wxauto stand-in client instead of a real WeChat window "
+                             "(journals and metrics get a _dryrun suffix)")
+    parser.add_argument("--simulate", action="store_true",
+                        help="Run on a virtual clock so pacing sleeps return immediately (requires --fake)")
+    args = parser.parse_args(argv)
+    if args.simulate and not args.fake:
+        # Without pacing every add would hit a real account back to back
+        parser.error("--simulate skips all pacing and is only allowed together with --fake")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.fake:
+        import fake_wxauto
+        fake_wxauto.install()
+
+    if not os.path.exists(file_path):
+        print(f"❌ List not found: {file_path}")
+        return
+
+    accounts_config = ACCOUNTS
+    if args.accounts:
+        with open(args.accounts, "r", encoding="utf-8") as f:
+            accounts_config = json.load(f)
+
+    sim = SimClock() if args.simulate else None
+    clock, sleep = (sim.time, sim.sleep) if sim else (time.time, time.sleep)
+    # Fake runs get their own journals and metrics so they never mark real numbers as finished
+    # or use up the real accounts' daily quota
+    accounts = [Account(config, clock, dry_run=args.fake) for config in accounts_config]
+
+    try:
+        # Bulk pre-check so malformed, duplicated or known numbers never reach the slow UI loop
+        validated_path, counts = prevalidate(file_path, [a.journal for a in accounts])
+        print(f"Pre-check: {counts} (rejected rows written to {rejects_path})")
+
+        # Initialize WeChat
+        for account in accounts:
+            account.connect()
+
+        coordinator = Coordinator(accounts, (row for _, row in iter_rows(validated_path)), counts["valid"],
+                                  clock, sleep)
+        try:
+            coordinator.run()
+        finally:
+            print(coordinator.report())
+    finally:
+        for account in accounts:
+            account.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# ====================
+# wxauto 替身：不依赖 Windows 微信客户端，按时间轴回放消息轨迹
+# 用于在任意平台上压测/调试 wechat agent 3.0.py 的主循环和发送路径
+# ====================
+import json
+import random
+import sys
+import threading
+import time
+import types
+from datetime import datetime
+from typing import Dict, List, Optional
+
+SAMPLE_QUESTIONS = [
+    "课程什么时候开始？",
+    "这个课适合零基础吗",
+    "报名费用是多少呀",
+    "上课是线上还是线下？",
+    "有没有回放可以看",
+    "结业有证书吗",
+    "老师是哪个学校的",
+    "作业需要每周交吗？",
+]
+
+
+class FakeMessage:
+    """模拟 wxauto 的消息对象"""
+
+    def __init__(self, msg_id: int, chat: str, sender: str, content: str,
+                 msg_type: str = "friend", due: float = 0.0):
+        self.id = msg_id
+        self.chat = chat
+        self.sender = sender
+        self.content = content
+        self.type = msg_type
+        self.due = due                      # 相对回放开始的到达时间（秒）
+        self.arrived_at: Optional[float] = None
+        self.detected_at: Optional[float] = None
+
+    def __repr__(self):
+        return f"<FakeMessage #{self.id} {self.chat}/{self.sender}: {self.content!r}>"
+
+
+class FakeChat:
+    """模拟 wxauto 的聊天窗口对象（GetListenMessage 返回的键）"""
+
+    def __init__(self, who: str, wechat: "WeChat"):
+        self.who = who
+        self._wechat = wechat
+
+    def SendMsg(self, msg: str):
+        self._wechat.SendMsg(msg, who=self.who)
+
+    def __repr__(self):
+        return f"<FakeChat {self.who}>"
+
+
+class WeChat:
+    """实现 ChatWith / AddListenChat / GetListenMessage / SendMsg / AddNewFriend 的微信替身
+
+    消息在回放开始（首次调用 GetListenMessage）后按 due/speed 的时间到达；
+    poll_cost/send_cost/add_cost 模拟 UI 自动化的耗时，并统计被并发调用的次数；
+    add_success_rate/add_error_rate/daily_limit 模拟加好友的成功率、异常和账号每日上限"""
+
+    defaults: Dict = {}                     # 由压测脚本预先设置，WeChat() 无参构造时使用
+    last_instance: Optional["WeChat"] = None
+
+    def __init__(self, trace: Optional[List[FakeMessage]] = None, speed: float = None,
+                 poll_cost: float = None, send_cost: float = None, **kwargs):
+        opts = dict(WeChat.defaults)
+        opts.update(kwargs)
+        trace = trace if trace is not None else opts.get("trace", [])
+        self.speed = speed if speed is not None else opts.get("speed", 1.0)
+        self.poll_cost = poll_cost if poll_cost is not None else opts.get("poll_cost", 0.0)
+        self.send_cost = send_cost if send_cost is not None else opts.get("send_cost", 0.0)
+        self.add_cost = opts.get("add_cost", 0.0)
+        self.add_success_rate = opts.get("add_success_rate", 1.0)
+        self.add_error_rate = opts.get("add_error_rate", 0.0)
+        self.daily_limit: Optional[int] = opts.get("daily_limit")
+        self._rng = random.Random(opts.get("seed"))
+
+        self.trace = sorted(trace, key=lambda m: m.due)
+        self.start_time: Optional[float] = None
+        self.listening: Dict[str, FakeChat] = {}
+        self.sent: List[Dict] = []          # {"chat", "content", "time"}
+        self.friend_requests: List[Dict] = []   # {"keywords", "addmsg", "remark", "tags", "ok"}
+        self.poll_count = 0
+        self.concurrent_calls = 0           # UI操作被多个线程同时调用的次数
+        self._cursor = 0
+        self._active_calls = 0
+        self._lock = threading.Lock()
+        WeChat.last_instance = self
+
+    # ---- wxauto 接口 ----
+    def ChatWith(self, who: str):
+        with self._ui_call(0.0):
+            pass
+
+    def AddListenChat(self, who: str, **kwargs):
+        with self._lock:
+            self.listening.setdefault(who, FakeChat(who, self))
+
+    def GetListenMessage(self, who: Optional[str] = None) -> Dict[FakeChat, List[FakeMessage]]:
+        with self._ui_call(self.poll_cost):
+            now = time.time()
+            with self._lock:
+                if self.start_time is None:
+                    self.start_time = now
+                self.poll_count += 1
+                result: Dict[FakeChat, List[FakeMessage]] = {}
+                while self._cursor < len(self.trace):
+                    msg = self.trace[self._cursor]
+                    arrival = self.start_time + msg.due / self.speed
+                    if arrival > now:
+                        break
+                    self._cursor += 1
+                    chat = self.listening.get(msg.chat)
+                    if chat is None or (who and who != msg.chat):
+                        continue
+                    msg.arrived_at = arrival
+                    msg.detected_at = now
+                    result.setdefault(chat, []).append(msg)
+                return result
+
+    def SendMsg(self, msg: str, who: Optional[str] = None, **kwargs):
+        with self._ui_call(self.send_cost):
+            with self._lock:
+                self.sent.append({"chat": who, "content": msg, "time": time.time()})
+
+    def AddNewFriend(self, keywords: str, addmsg: Optional[str] = None, remark: Optional[str] = None,
+                     tags: Optional[List[str]] = None) -> bool:
+        with self._ui_call(self.add_cost):
+            with self._lock:
+                if self._rng.random() < self.add_error_rate:
+                    raise RuntimeError("找不到添加好友窗口")
+                limited = self.daily_limit is not None and len(self.friend_requests) >= self.daily_limit
+                ok = not limited and self._rng.random() < self.add_success_rate
+                self.friend_requests.append({"keywords": keywords, "addmsg": addmsg, "remark": remark,
+                                             "tags": tags, "ok": ok})
+                return ok
+
+    # ---- 回放状态 ----
+    def finished(self) -> bool:
+        """轨迹中的消息是否都已送达"""
+        with self._lock:
+            return self.start_time is not None and self._cursor >= len(self.trace)
+
+    def _ui_call(self, cost: float):
+        return _UICall(self, cost)
+
+
+class _UICall:
+    """统计同时进行的UI操作，并模拟操作耗时"""
+
+    def __init__(self, wechat: WeChat, cost: float):
+        self.wechat = wechat
+        self.cost = cost
+
+    def __enter__(self):
+        with self.wechat._lock:
+            self.wechat._active_calls += 1
+            if self.wechat._active_calls > 1:
+                self.wechat.concurrent_calls += 1
+        if self.cost > 0:
+            time.sleep(self.cost)
+
+    def __exit__(self, *exc):
+        with self.wechat._lock:
+            self.wechat._active_calls -= 1
+
+
+# ====================
+# 消息轨迹
+# ====================
+def synthetic_trace(groups: int, rate: float, duration: float, seed: int = 0) -> List[FakeMessage]:
+    """生成合成轨迹：groups个群，每个群按泊松过程平均每秒rate条消息"""
+    rng = random.Random(seed)
+    trace: List[FakeMessage] = []
+    for g in range(groups):
+        chat = f"压测群{g + 1:02d}"
+        t = rng.expovariate(rate) if rate > 0 else duration
+        while t < duration:
+            sender = f"成员{rng.randint(1, 30)}"
+            trace.append(FakeMessage(0, chat, sender, rng.choice(SAMPLE_QUESTIONS), due=t))
+            t += rng.expovariate(rate)
+    trace.sort(key=lambda m: m.due)
+    for i, msg in enumerate(trace, 1):
+        msg.id = i
+    return trace
+
+
+def load_trace(path: str) -> List[FakeMessage]:
+    """读取JSONL轨迹。每行需含 chat/sender/content（或 message），
+    时间取 t（相对秒数）或 timestamp（"%Y-%m-%d %H:%M:%S"，如聊天日志），可选 type"""
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                continue
+
+    base = None
+    trace: List[FakeMessage] = []
+    for row in rows:
+        if "t" in row:
+            due = float(row["t"])
+        else:
+            ts = datetime.strptime(row["timestamp"], "%Y-%m-%d %H:%M:%S").timestamp()
+            base = ts if base is None else base
+            due = ts - base
+        trace.append(FakeMessage(0, row.get("chat") or "压测群01", row.get("sender") or "成员",
+                                 row.get("content") or row.get("message") or "",
+                                 row.get("type", "friend"), due))
+    trace.sort(key=lambda m: m.due)
+    for i, msg in enumerate(trace, 1):
+        msg.id = i
+    return trace
+
+
+def install():
+    """把替身注册为 wxauto 模块，并在没有桌面环境时提供空操作的 pyautogui"""
+    module = types.ModuleType("wxauto")
+    module.WeChat = WeChat
+    sys.modules["wxauto"] = module
+
+    try:
+        import pyautogui  # noqa: F401
+    except Exception:
+        gui = types.ModuleType("pyautogui")
+        gui.position = lambda: (0, 0)
+        gui.moveTo = lambda *args, **kwargs: None
+        gui.doubleClick = lambda *args, **kwargs: None
+        sys.modules["pyautogui"] = gui
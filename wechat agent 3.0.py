@@ -1,27 +1,26 @@
 # 标准库
+import time
+_STARTUP_T0 = time.perf_counter()  # 启动计时起点
 import os
 import sys
-import time
 import threading
 import logging
-from queue import Queue
+import json
+import re
+import contextlib
+import heapq
+import itertools
+from concurrent.futures import Future
+from collections import OrderedDict, deque
+from queue import Queue, Empty
 from datetime import datetime
-from typing import Tuple, Optional, List
+from typing import TYPE_CHECKING, Tuple, Optional, List, Dict, Callable
 
-# 第三方库
-import pyautogui
+# 第三方库（pyautogui、python-docx、tiktoken、rich、wxauto 较重，改为用到时再导入）
 import requests
-import tiktoken
-from docx import Document
-from rich.console import Console
-from rich.layout import Layout
-from rich.live import Live
-from rich.panel import Panel
-from rich.progress import Progress
-from rich.text import Text
-
-# 本地库
-from wxauto import WeChat
+
+if TYPE_CHECKING:
+    from rich.layout import Layout
 
 # 配置日志系统
 logging.basicConfig(
@@ -47,7 +46,16 @@ class Config:
 
     # 监听配置
     LISTEN_NAMES = ['群聊名称']                     # 监听的微信联系人/群名称
-    CHECK_INTERVAL = 1                            # 新消息检查间隔（秒）
+    SHOW_DASHBOARD = True                         # 是否显示全屏终端界面
+
+    # UI自动化线程配置（所有wxauto/pyautogui操作都在同一线程执行）
+    UI_SENDS_BETWEEN_POLLS = 3                    # 有轮询在等待时，最多连续执行几次发送
+    UI_SEND_BATCH_MAX = 5                         # 同一会话排队的消息最多合并几条一起发送
+    UI_CALL_TIMEOUT = 60                          # 等待UI操作完成的最长时间（秒）
+    SHUTDOWN_DRAIN_TIMEOUT = 30                   # 退出前等待处理中的消息发完回复的最长时间（秒）
+    POLL_MIN_INTERVAL = 0.2                       # 有新消息后的最短检查间隔（秒）
+    POLL_MAX_INTERVAL = 3                         # 空闲时退避到的最长检查间隔（秒）
+    POLL_BACKOFF_FACTOR = 2                       # 空闲时检查间隔的增长倍数
     MAX_DURATION = 300                            # 最大运行时间（秒）
 
     # 知识库配置（改为文件夹形式）
@@ -55,106 +63,286 @@ class Config:
     SUPPORTED_EXTS = [".docx", ".txt", ".pdf"]  # 支持docx, txt, pdf
     MAX_TOKENS = 25600 
 
+    # 多轮对话记忆配置
+    MEMORY_MAX_TOKENS = 2000                # 每个会话的历史Token预算（含摘要）
+    MEMORY_SUMMARY_TOKENS = 500             # 早期对话摘要的Token上限
+    MEMORY_TURN_MAX_TOKENS = 400            # 单轮对话中每条消息最多保留的Token
+    MEMORY_MAX_CHATS = 50                   # 最多同时保留记忆的会话数（LRU淘汰）
+    MEMORY_IDLE_TIMEOUT = 1800              # 会话闲置多久后清除记忆（秒）
+
+    # 快速通道配置（简单消息不调用大模型）
+    FAST_PATH_ENABLED = True                # 是否启用快速通道
+    FAST_PATH_FILE = "fast_path.json"       # 自定义规则文件（放在KNOWLEDGE_DIR下，可选）
+
+    # 流式回复配置
+    STREAM_REPLY = True                     # 是否边生成边按句发送
+    STREAM_MIN_SEGMENT_CHARS = 20           # 每段最少字符数，避免刷屏
+
+    # 聊天日志配置（实时追加写入JSONL，崩溃也不会丢失）
+    CHAT_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chat_logs")
+    CHAT_LOG_MAX_BYTES = 10 * 1024 * 1024   # 单个日志文件上限，超过后轮转
+    CHAT_LOG_MAX_FILES = 30                 # 最多保留的日志文件数
+    CHAT_LOG_FLUSH_INTERVAL = 2             # 定期落盘（fsync）间隔（秒）
+    CHAT_LOG_FLUSH_EVERY = 20               # 累计多少条记录立即落盘
+
+    # 对冲请求配置（主请求迟迟没有响应时，换一个KEY再发一份，先返回的为准）
+    HEDGE_ENABLED = False                   # 是否启用对冲请求
+    HEDGE_PERCENTILE = 95                   # 等待时间取历史首包延迟的该分位数
+    HEDGE_MIN_DELAY = 2                     # 对冲等待时间下限（秒）
+    HEDGE_MAX_DELAY = 15                    # 对冲等待时间上限（样本不足时也用该值，秒）
+    HEDGE_MIN_SAMPLES = 20                  # 样本数达到多少后才按分位数计算等待时间
+    HEDGE_MAX_RATE = 0.1                    # 对冲请求最多占全部请求的比例
+    HEDGE_MODEL = None                      # 对冲请求改用的模型（None表示与主请求相同）
+
     # 重试配置
     API_MAX_RETRIES = 5                     # 最大重试次数
     API_RETRY_DELAY = 1                     # 初始延迟（秒）
     API_RETRY_STATUS_CODES = [429, 502]     # 需要重试的状态码
-    API_KEY_ROTATE_CODES = [403, 429]        # 需要切换KEY的状态码
-    _current_key_index = 0                  # 当前使用的KEY索引
-    _key_lock = threading.Lock()            # KEY切换锁
+
+    # KEY池配置（请求分散到所有可用KEY）
+    API_KEY_MAX_CONCURRENCY = 4             # 每个KEY的最大并发请求数
+    API_KEY_RATE_PER_MIN = 60               # 每个KEY每分钟最多请求数（令牌桶）
+    API_KEY_BURST = 5                       # 令牌桶容量（允许的突发请求数）
+    API_KEY_COOLDOWN = 10                   # 429后的冷却时间（秒），连续429时翻倍
+    API_KEY_MAX_COOLDOWN = 120              # 冷却时间上限（秒）
+    API_KEY_DISABLE_CODES = [401, 403]      # 返回这些状态码的KEY直接移出KEY池
+    API_KEY_ACQUIRE_TIMEOUT = 30            # 等待可用KEY的最长时间（秒）
  
 
+    @staticmethod
+    def validate() -> List[str]:
+        """启动前快速检查配置，返回错误列表"""
+        errors = []
+        if not Config.API_KEYS:
+            errors.append("API_KEYS 为空")
+        if not Config.LISTEN_NAMES:
+            errors.append("LISTEN_NAMES 为空")
+        if Config.MAX_DURATION <= 0:
+            errors.append("MAX_DURATION 必须大于0")
+        if Config.POLL_MIN_INTERVAL <= 0:
+            errors.append("POLL_MIN_INTERVAL 必须大于0")
+        return errors
+
+class StartupTimer:
+    """记录启动各阶段耗时"""
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+        self._last = _STARTUP_T0
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - _STARTUP_T0
+
+    def report(self) -> str:
+        lines = [f"  {stage}: {seconds:.2f}s" for stage, seconds in self.stages]
+        return "启动耗时明细：\n" + "\n".join(lines) + f"\n  合计: {self.elapsed():.2f}s"
+
+class _LazyConsole:
+    """首次输出时才导入 rich 并创建 Console"""
+
+    def __init__(self):
+        self._console = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if self._console is None:
+            with self._lock:
+                if self._console is None:
+                    from rich.console import Console
+                    self._console = Console()
+        return getattr(self._console, name)
+
 # ====================
 # 初始化全局组件
 # ====================
-console = Console()
+startup_timer = StartupTimer()
+console = _LazyConsole()
 message_queue = Queue()  # 用于线程间通信
-wx = WeChat()            # 微信客户端
 
-class APIClient:
-    @staticmethod
-    def get_auth_header() -> dict:
-        """获取当前API密钥的认证头"""
-        with Config._key_lock:
-            key = Config.API_KEYS[Config._current_key_index % len(Config.API_KEYS)]
-        return {"Authorization": f"Bearer {key}"}
+class APIKeyPool:
+    """API密钥池：把请求分散到所有健康的KEY，按KEY限制并发和速率，
+    429后冷却、401/403后移除，并统计每个KEY的成功率和延迟"""
 
-    @staticmethod
-    def rotate_key():
-        """轮换到下一个API密钥"""
-        with Config._key_lock:
-            Config._current_key_index += 1
-            logging.warning(f"切换到备用KEY #{Config._current_key_index % len(Config.API_KEYS) + 1}")
+    class _KeyState:
+        def __init__(self, index: int, key: str, burst: float):
+            self.index = index
+            self.key = key
+            self.in_flight = 0
+            self.tokens = burst
+            self.last_refill = time.time()
+            self.last_used = 0.0
+            self.cooldown_until = 0.0
+            self.consecutive_429 = 0
+            self.disabled = False
+            self.successes = 0
+            self.failures = 0
+            self.latency = None         # 成功请求延迟的指数移动平均（秒）
+
+        @property
+        def success_rate(self) -> float:
+            total = self.successes + self.failures
+            return self.successes / total if total else 1.0
+
+        @property
+        def label(self) -> str:
+            return f"KEY#{self.index + 1}"
+
+    def __init__(self, keys: List[str],
+                 max_concurrency: Optional[int] = None,
+                 rate_per_min: Optional[float] = None,
+                 burst: Optional[float] = None):
+        rate_per_min = Config.API_KEY_RATE_PER_MIN if rate_per_min is None else rate_per_min
+        burst = Config.API_KEY_BURST if burst is None else burst
+        self.max_concurrency = Config.API_KEY_MAX_CONCURRENCY if max_concurrency is None else max_concurrency
+        self.rate = rate_per_min / 60.0
+        self.burst = burst
+        self._keys = [self._KeyState(i, key, burst) for i, key in enumerate(keys)]
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None,
+                exclude: Tuple[str, ...] = ()) -> Optional["APIKeyPool._KeyState"]:
+        """取得一个可用KEY（会阻塞等待并发槽位/令牌/冷却结束），全部不可用时返回None"""
+        timeout = Config.API_KEY_ACQUIRE_TIMEOUT if timeout is None else timeout
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                now = time.time()
+                candidates = [k for k in self._keys if not k.disabled and k.key not in exclude]
+                if not candidates:
+                    return None
+
+                wait = deadline - now
+                ready = []
+                for k in candidates:
+                    self._refill(k, now)
+                    if k.cooldown_until > now:
+                        wait = min(wait, k.cooldown_until - now)
+                    elif k.in_flight >= self.max_concurrency:
+                        continue  # 等待release唤醒
+                    elif k.tokens < 1:
+                        wait = min(wait, (1 - k.tokens) / self.rate if self.rate > 0 else wait)
+                    else:
+                        ready.append(k)
+
+                if ready:
+                    # 负载最低的优先，其次成功率高、延迟低、最久未使用
+                    best = min(ready, key=lambda k: (k.in_flight, -k.success_rate,
+                                                     k.latency or 0.0, k.last_used))
+                    best.tokens -= 1
+                    best.in_flight += 1
+                    best.last_used = now
+                    return best
+
+                if now >= deadline:
+                    logging.warning("等待可用API KEY超时")
+                    return None
+                self._cond.wait(max(wait, 0.01))
+
+    def release(self, state: "APIKeyPool._KeyState", status, latency: float):
+        """归还KEY并记录结果：status为HTTP状态码，网络错误传字符串"""
+        with self._cond:
+            state.in_flight = max(state.in_flight - 1, 0)
+            if status == "CANCELLED":
+                pass  # 被放弃的对冲请求不计入KEY的健康统计
+            elif status == 200:
+                state.successes += 1
+                state.consecutive_429 = 0
+                state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+            else:
+                state.failures += 1
+                if status == 429:
+                    cooldown = min(Config.API_KEY_COOLDOWN * (2 ** state.consecutive_429),
+                                   Config.API_KEY_MAX_COOLDOWN)
+                    state.consecutive_429 += 1
+                    state.cooldown_until = time.time() + cooldown
+                    logging.warning("%s 被限流，冷却 %ds", state.label, cooldown)
+                elif status in Config.API_KEY_DISABLE_CODES and not state.disabled:
+                    state.disabled = True
+                    logging.error("%s 返回 %s，已移出KEY池", state.label, status)
+            self._cond.notify_all()
+
+    def stats(self) -> List[Dict]:
+        """每个KEY的状态快照，用于界面展示"""
+        now = time.time()
+        with self._cond:
+            return [{
+                "label": k.label,
+                "status": "停用" if k.disabled else ("冷却" if k.cooldown_until > now else "正常"),
+                "in_flight": k.in_flight,
+                "success_rate": k.success_rate,
+                "latency": k.latency,
+                "requests": k.successes + k.failures,
+            } for k in self._keys]
+
+    def _refill(self, state: "APIKeyPool._KeyState", now: float):
+        """按经过的时间补充令牌（调用方需持有锁）"""
+        state.tokens = min(self.burst, state.tokens + (now - state.last_refill) * self.rate)
+        state.last_refill = now
+
+key_pool = APIKeyPool(Config.API_KEYS)
 
 class KnowledgeManager:
     """知识库管理器：整合多来源知识"""
     
+    _encoder = None
+    _encoder_lock = threading.Lock()
+
+    @staticmethod
+    def get_encoder():
+        """获取Token编码器（首次调用时创建，之后复用）"""
+        if KnowledgeManager._encoder is None:
+            with KnowledgeManager._encoder_lock:
+                if KnowledgeManager._encoder is None:
+                    import tiktoken
+                    try:
+                        # 尝试使用DeepSeek专用编码（如果不存在则使用默认）
+                        encoder = tiktoken.encoding_for_model("DeepSeek-R1-Distill-Qwen-32B")
+                    except KeyError:
+                        encoder = tiktoken.get_encoding("cl100k_base")
+                    KnowledgeManager._encoder = encoder
+        return KnowledgeManager._encoder
+
     @staticmethod
     def calculate_tokens(text: str) -> int:
         """计算文本的Token数量"""
-        try:
-            # 尝试使用DeepSeek专用编码（如果不存在则使用默认）
-            encoder = tiktoken.encoding_for_model("DeepSeek-R1-Distill-Qwen-32B")
-        except KeyError:
-            encoder = tiktoken.get_encoding("cl100k_base")
-        return len(encoder.encode(text))
+        return len(KnowledgeManager.get_encoder().encode(text))
 
     @staticmethod
-    def load_folder() -> Tuple[str, int]:
-        """加载知识库并返回（内容，总Token数）"""
-        combined: List[str] = []
-        total_tokens = 0
-        
-        try:
-            if not os.path.exists(Config.KNOWLEDGE_DIR):
-                console.print(f"[red]❌ 知识库文件夹不存在: {Config.KNOWLEDGE_DIR}[/]")
-                return "", 0
-
-            for root, _, files in os.walk(Config.KNOWLEDGE_DIR):
-                for file in files:
-                    file_ext = os.path.splitext(file)[1].lower()
-                    if file_ext in Config.SUPPORTED_EXTS:
-                        file_path = os.path.join(root, file)
-                        content = KnowledgeManager.load(file_path)
-                        
-                        if content:
-                            # 计算并累加Token
-                            tokens = KnowledgeManager.calculate_tokens(content)
-                            total_tokens += tokens
-                            console.print(f"[dim]📄 {os.path.basename(file_path)}: {tokens} tokens[/]")
-                            
-                            # 实时检查Token限制
-                            if total_tokens > Config.MAX_TOKENS:
-                                console.print(f"[red]❌ 知识库Token超过限制 ({total_tokens}/{Config.MAX_TOKENS})[/]")
-                                sys.exit(1)
-                                
-                            # 错误代码（KnowledgeManager.load_folder）
-                            combined.append(f"【知识来源：os.path.basename(file_path)】\n{content}")
-
-            console.print(f"[green]✅ 知识库加载完成 总Token数: {total_tokens}/{Config.MAX_TOKENS}[/]")
-            return "\n\n".join(combined), total_tokens
-            
-        except Exception as e:
-            console.print(f"[red]❌ 加载知识库失败: {str(e)}[/]")
-            return "", 0
+    def truncate_tokens(text: str, max_tokens: int) -> str:
+        """按Token数截断文本，保留开头部分"""
+        encoder = KnowledgeManager.get_encoder()
+        tokens = encoder.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        if max_tokens <= 0:
+            return ""
+        return encoder.decode(tokens[:max_tokens])
 
     @staticmethod
-    def count_files() -> int:
-        """统计知识库文件夹中支持的文件数量"""
-        count = 0
-        try:
-            if not os.path.exists(Config.KNOWLEDGE_DIR):
-                return 0
-                
-            for root, _, files in os.walk(Config.KNOWLEDGE_DIR):
-                for file in files:
-                    file_ext = os.path.splitext(file)[1].lower()
-                    if file_ext in Config.SUPPORTED_EXTS:
-                        count += 1
-            return count
-        except Exception as e:
-            console.print(f"[red]❌ 统计文件失败: {str(e)}[/]")
-            return 0
+    def iter_folder():
+        """逐个读取知识库文件，依次产出（文件路径，内容，Token数）"""
+        if not os.path.exists(Config.KNOWLEDGE_DIR):
+            console.print(f"[red]❌ 知识库文件夹不存在: {Config.KNOWLEDGE_DIR}[/]")
+            return
+
+        for root, _, files in os.walk(Config.KNOWLEDGE_DIR):
+            for file in files:
+                file_ext = os.path.splitext(file)[1].lower()
+                if file_ext in Config.SUPPORTED_EXTS:
+                    file_path = os.path.join(root, file)
+                    content = KnowledgeManager.load(file_path)
+                    if content:
+                        yield file_path, content, KnowledgeManager.calculate_tokens(content)
+
+    @staticmethod
+    def format_source(file_path: str, content: str) -> str:
+        """给单个知识文件加上来源标记"""
+        return f"【知识来源：{os.path.basename(file_path)}】\n{content}"
 
     @staticmethod
     def load(file_path: str) -> str:
@@ -177,6 +365,7 @@ class KnowledgeManager:
     def _load_docx(path: str) -> str:
         """读取Word文档内容"""
         try:
+            from docx import Document
             doc = Document(path)
             return "\n".join([p.text for p in doc.paragraphs])
         except Exception as e:
@@ -215,55 +404,677 @@ class KnowledgeManager:
             console.print(f"[red]❌ 读取PDF失败 {path}: {str(e)}[/]")
             return ""
 
-class ChatLogger:
-    """聊天日志记录器"""
-    
+class ConversationMemory:
+    """多轮对话记忆：按会话保存历史，严格限制Token预算，闲置会话按LRU淘汰"""
+
+    class _Conversation:
+        def __init__(self):
+            self.turns = deque()        # (用户消息, 助手回复, Token数)
+            self.turn_tokens = 0
+            self.summary = ""           # 被挤出的早期对话的压缩摘要
+            self.summary_tokens = 0
+            self.last_active = time.time()
+
+    def __init__(self,
+                 max_tokens: Optional[int] = None,
+                 summary_tokens: Optional[int] = None,
+                 turn_max_tokens: Optional[int] = None,
+                 max_chats: Optional[int] = None,
+                 idle_timeout: Optional[float] = None):
+        max_tokens = Config.MEMORY_MAX_TOKENS if max_tokens is None else max_tokens
+        summary_tokens = Config.MEMORY_SUMMARY_TOKENS if summary_tokens is None else summary_tokens
+        self.max_tokens = max_tokens
+        self.summary_tokens = min(summary_tokens, max_tokens)
+        self.turn_max_tokens = Config.MEMORY_TURN_MAX_TOKENS if turn_max_tokens is None else turn_max_tokens
+        self.max_chats = Config.MEMORY_MAX_CHATS if max_chats is None else max_chats
+        self.idle_timeout = Config.MEMORY_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self._chats: "OrderedDict[str, ConversationMemory._Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_messages(self, chat_name: str) -> List[Dict[str, str]]:
+        """返回该会话的历史消息（OpenAI messages格式），不含当前问题"""
+        with self._lock:
+            self._evict_idle()
+            conv = self._chats.get(chat_name)
+            if conv is None:
+                return []
+            self._chats.move_to_end(chat_name)
+            conv.last_active = time.time()
+
+            messages = []
+            if conv.summary:
+                messages.append({"role": "system", "content": f"此前对话摘要：\n{conv.summary}"})
+            for user_msg, reply, _ in conv.turns:
+                messages.append({"role": "user", "content": user_msg})
+                messages.append({"role": "assistant", "content": reply})
+            return messages
+
+    def add_turn(self, chat_name: str, message: str, reply: str):
+        """记录一轮对话，超出预算时把最早的轮次压缩进摘要"""
+        message = KnowledgeManager.truncate_tokens(message, self.turn_max_tokens)
+        reply = KnowledgeManager.truncate_tokens(reply, self.turn_max_tokens)
+        tokens = KnowledgeManager.calculate_tokens(message) + KnowledgeManager.calculate_tokens(reply)
+
+        with self._lock:
+            conv = self._chats.get(chat_name)
+            if conv is None:
+                conv = self._Conversation()
+                self._chats[chat_name] = conv
+            self._chats.move_to_end(chat_name)
+            conv.last_active = time.time()
+
+            conv.turns.append((message, reply, tokens))
+            conv.turn_tokens += tokens
+            self._compact(conv)
+
+            self._evict_idle()
+            while len(self._chats) > self.max_chats:
+                evicted, _ = self._chats.popitem(last=False)
+                logging.info("对话记忆LRU淘汰: %s", evicted)
+
+    def clear(self, chat_name: Optional[str] = None):
+        """清除某个会话（或全部会话）的记忆"""
+        with self._lock:
+            if chat_name is None:
+                self._chats.clear()
+            else:
+                self._chats.pop(chat_name, None)
+
+    def stats(self) -> Tuple[int, int]:
+        """返回（会话数，记忆总Token数）"""
+        with self._lock:
+            total = sum(c.turn_tokens + c.summary_tokens for c in self._chats.values())
+            return len(self._chats), total
+
+    def _compact(self, conv: "ConversationMemory._Conversation"):
+        """把超出预算的早期轮次折叠进摘要，摘要本身只保留最近的部分"""
+        folded = []
+        # 至少保留最近一轮完整对话
+        while len(conv.turns) > 1 and conv.turn_tokens + conv.summary_tokens > self.max_tokens:
+            user_msg, reply, tokens = conv.turns.popleft()
+            conv.turn_tokens -= tokens
+            folded.append(f"用户：{self._brief(user_msg)}\n助手：{self._brief(reply)}")
+
+        if folded or conv.turn_tokens + conv.summary_tokens > self.max_tokens:
+            lines = "\n".join(filter(None, [conv.summary] + folded)).split("\n")
+            budget = min(self.summary_tokens, max(self.max_tokens - conv.turn_tokens, 0))
+            # 从最早的一轮开始整行丢弃，不在Token中间截断（避免半行或半个汉字）
+            while lines and KnowledgeManager.calculate_tokens("\n".join(lines)) > budget:
+                lines.pop(0)
+                while lines and lines[0].startswith("助手："):
+                    lines.pop(0)
+            conv.summary = "\n".join(lines)
+            conv.summary_tokens = KnowledgeManager.calculate_tokens(conv.summary) if conv.summary else 0
+
+    @staticmethod
+    def _brief(text: str, limit: int = 60) -> str:
+        """压缩单条消息用于摘要"""
+        text = " ".join(text.split())
+        return text if len(text) <= limit else text[:limit] + "…"
+
+    def _evict_idle(self):
+        """清除闲置超时的会话（调用方需持有锁）"""
+        if self.idle_timeout <= 0:
+            return
+        deadline = time.time() - self.idle_timeout
+        while self._chats:
+            name, conv = next(iter(self._chats.items()))
+            if conv.last_active >= deadline:
+                break
+            del self._chats[name]
+            logging.info("对话记忆闲置清除: %s", name)
+
+class PollScheduler:
+    """自适应轮询调度：有消息时快速轮询，空闲时指数退避到上限"""
+
+    def __init__(self,
+                 min_interval: Optional[float] = None,
+                 max_interval: Optional[float] = None,
+                 backoff: Optional[float] = None):
+        min_interval = Config.POLL_MIN_INTERVAL if min_interval is None else min_interval
+        max_interval = Config.POLL_MAX_INTERVAL if max_interval is None else max_interval
+        backoff = Config.POLL_BACKOFF_FACTOR if backoff is None else backoff
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.backoff = max(backoff, 1.0)
+        self.interval = min_interval
+        self.last_poll: Optional[float] = None
+        self.latencies = deque(maxlen=1000)    # 消息到达→被检测到的延迟上限（秒）
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def record_poll(self, message_count: int):
+        """记录一次轮询结果并调整下次间隔"""
+        now = time.time()
+        with self._lock:
+            if message_count:
+                # 消息在两次轮询之间到达，上次轮询至今的间隔即检测延迟的上限
+                if self.last_poll is not None:
+                    self.latencies.extend([now - self.last_poll] * message_count)
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * self.backoff, self.max_interval)
+            self.last_poll = now
+
+    def notify_activity(self):
+        """会话有动作（如刚发出回复）时调用，立即恢复快速轮询"""
+        with self._lock:
+            self.interval = self.min_interval
+        self._wake.set()
+
+    def wait(self):
+        """等待到下次轮询，期间有活动会被提前唤醒"""
+        with self._lock:
+            interval = self.interval
+        self._wake.wait(interval)
+        self._wake.clear()
+
+    def stats(self) -> Tuple[float, float, float]:
+        """返回（当前间隔，平均检测延迟，P95检测延迟）"""
+        with self._lock:
+            samples = sorted(self.latencies)
+            interval = self.interval
+        if not samples:
+            return interval, 0.0, 0.0
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return interval, sum(samples) / len(samples), p95
+
+class SentenceSegmenter:
+    """把流式生成的文本按句子/段落切分，凑够最小长度才输出一段"""
+
+    # 句末标点（可跟随右引号/右括号）或段落换行
+    BOUNDARY = re.compile(r"(?:[。！？!?；;…~～]+|\.(?=\s)|\n)[”’」』）)]*")
+
+    def __init__(self, min_chars: Optional[int] = None):
+        self.min_chars = Config.STREAM_MIN_SEGMENT_CHARS if min_chars is None else min_chars
+        self.buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """追加新文本，返回已可发送的完整段落"""
+        self.buffer += text
+        segments = []
+        while True:
+            cut = None
+            for match in self.BOUNDARY.finditer(self.buffer):
+                if len(self.buffer[:match.end()].strip()) >= self.min_chars:
+                    cut = match.end()
+                    break
+            if cut is None:
+                return segments
+            segment = self.buffer[:cut].strip()
+            self.buffer = self.buffer[cut:]
+            if segment:
+                segments.append(segment)
+
+    def flush(self) -> Optional[str]:
+        """生成结束时取出剩余文本"""
+        segment = self.buffer.strip()
+        self.buffer = ""
+        return segment or None
+
+class FastPathRules:
+    """快速通道：在调用大模型前用精确/正则/关键词规则处理简单消息，
+    命中后直接回复固定话术，或对纯确认类消息不做回复
+
+    规则文件为JSON列表，每条形如：
+        {"match": "exact" | "regex" | "keyword", "pattern": "收到" 或 ["关键词1", "关键词2"],
+         "reply": "固定回复"（为null表示不回复）, "max_len": 可选，消息超过该长度时不匹配}
+    """
+
+    # 默认规则：纯确认/表情不回复，致谢简单回应
+    DEFAULT_RULES = [
+        {"match": "exact", "pattern": ["好", "好的", "好滴", "好嘞", "好哒", "收到", "嗯", "嗯嗯", "哦", "哦哦",
+                                       "ok", "okay", "知道了", "明白", "明白了", "了解", "可以", "行"],
+         "reply": None},
+        {"match": "exact", "pattern": ["谢谢", "谢谢你", "谢谢老师", "多谢", "感谢", "thanks", "thx", "辛苦了"],
+         "reply": "不客气呀😊 有问题随时问～"},
+        # 只有表情：微信表情代码（如[微笑]）、emoji或标点（问号除外，单独的“？”通常是在追问）
+        {"match": "regex",
+         "pattern": r"^(?:\[[^\[\]]{1,8}\]|[\U0001F000-\U0001FAFF\u2600-\u27BF\uFE0F\u200D]|[\s!！.。~～,，])+$",
+         "reply": None},
+    ]
+
+    TRIM = " \t\r\n!！.。~～,，、…"     # 不去掉问号：“可以？”“好的？”是在提问
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path if path is not None else os.path.join(Config.KNOWLEDGE_DIR, Config.FAST_PATH_FILE)
+        self.rules = self._compile(self.DEFAULT_RULES + self._load_file(self.path))
+        self.hits = 0
+        self.ignored = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+
+    def match(self, message: str) -> Tuple[bool, Optional[str]]:
+        """返回（是否命中，固定回复）；命中但回复为None表示忽略该消息"""
+        text = (message or "").strip()
+        normalized = text.strip(self.TRIM).lower()
+        is_question = text.endswith(("?", "？"))
+        for kind, pattern, reply, max_len in self.rules:
+            if max_len is not None and len(text) > max_len:
+                continue
+            if reply is None and is_question:
+                continue  # 以问号结尾的消息不静默忽略，交给大模型
+            if kind == "exact":
+                matched = normalized in pattern
+            elif kind == "regex":
+                matched = pattern.search(text) is not None
+            else:
+                matched = any(word in normalized for word in pattern)
+            if matched:
+                return True, reply
+        return False, None
+
+    def record(self, reply: Optional[str], tokens_saved: int):
+        """记录一次命中及估算节省的Token"""
+        with self._lock:
+            self.hits += 1
+            if reply is None:
+                self.ignored += 1
+            self.tokens_saved += tokens_saved
+
+    def stats(self) -> Tuple[int, int, int]:
+        """返回（节省的大模型调用次数，其中忽略的消息数，估算节省的Token数）"""
+        with self._lock:
+            return self.hits, self.ignored, self.tokens_saved
+
+    def _compile(self, rules: List[Dict]) -> List[Tuple]:
+        compiled = []
+        for rule in rules:
+            kind = rule.get("match", "exact")
+            pattern = rule.get("pattern")
+            try:
+                if kind == "regex":
+                    pattern = re.compile(pattern)
+                elif kind in ("exact", "keyword"):
+                    words = [pattern] if isinstance(pattern, str) else list(pattern or [])
+                    words = [w.strip(self.TRIM).lower() for w in words if w]
+                    pattern = set(words) if kind == "exact" else words
+                else:
+                    raise ValueError(f"未知的匹配方式 {kind}")
+            except (re.error, TypeError, ValueError) as e:
+                console.print(f"[yellow]⚠️ 跳过无效的快速通道规则 {rule}: {str(e)}[/]")
+                continue
+            compiled.append((kind, pattern, rule.get("reply"), rule.get("max_len")))
+        return compiled
+
+    @staticmethod
+    def _load_file(path: str) -> List[Dict]:
+        """读取自定义规则文件，不存在时返回空列表"""
+        if not os.path.exists(path):
+            return []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                rules = json.load(f)
+            if not isinstance(rules, list):
+                raise ValueError("规则文件应为JSON列表")
+            logging.info("已加载快速通道规则 %d 条: %s", len(rules), path)
+            return rules
+        except Exception as e:
+            console.print(f"[red]❌ 读取快速通道规则失败 {path}: {str(e)}[/]")
+            return []
+
+class UIActor:
+    """UI自动化执行线程：wxauto通过UI自动化操作微信窗口，不能多线程同时调用，
+    所有操作都提交到这里的优先级队列，由唯一的线程依次执行，调用方等待Future
+
+    发送和轮询公平调度（有轮询等待时，最多连续执行UI_SENDS_BETWEEN_POLLS次发送），
+    同一会话排队中的多条消息合并为一次发送"""
+
+    PRIORITY_CONTROL = 0    # 初始化窗口等
+    PRIORITY_SEND = 1
+    PRIORITY_POLL = 2
+
+    class _Command:
+        __slots__ = ("priority", "seq", "func", "args", "kwargs", "future", "chat", "text")
+
+        def __init__(self, priority, seq, func, args, kwargs, chat=None, text=None):
+            self.priority = priority
+            self.seq = seq
+            self.func = func
+            self.args = args
+            self.kwargs = kwargs
+            self.future = Future()
+            self.chat = chat
+            self.text = text
+
+        def __lt__(self, other):
+            return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def __init__(self, sends_between_polls: Optional[int] = None, batch_max: Optional[int] = None):
+        self.sends_between_polls = Config.UI_SENDS_BETWEEN_POLLS if sends_between_polls is None else sends_between_polls
+        self.batch_max = Config.UI_SEND_BATCH_MAX if batch_max is None else batch_max
+        self._heap: List["UIActor._Command"] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._sends_since_poll = 0
+        self._thread = threading.Thread(target=self._run, name="UIActor", daemon=True)
+        # 统计
+        self.executed = 0
+        self.batched = 0            # 因合并而省掉的发送次数
+        self.max_queue = 0
+        self.busy_time = 0.0
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """执行完已排队的操作后停止"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def submit(self, func: Callable, *args, priority: int = PRIORITY_CONTROL, **kwargs) -> Future:
+        """提交一个UI操作，返回Future"""
+        return self._put(self._Command(priority, next(self._seq), func, args, kwargs))
+
+    def call(self, func: Callable, *args, priority: int = PRIORITY_CONTROL, **kwargs):
+        """提交UI操作并等待结果（在执行线程内调用时直接执行，避免死锁）"""
+        if threading.current_thread() is self._thread:
+            return func(*args, **kwargs)
+        return self.submit(func, *args, priority=priority, **kwargs).result(Config.UI_CALL_TIMEOUT)
+
+    def send(self, chat, text: str) -> Future:
+        """向会话发送消息，同一会话排队中的消息会合并发送"""
+        return self._put(self._Command(self.PRIORITY_SEND, next(self._seq), None, (), {},
+                                       chat=chat, text=text))
+
+    def stats(self) -> Tuple[int, int, int]:
+        """返回（当前排队数，已合并的发送次数，历史最大排队数）"""
+        with self._cond:
+            return len(self._heap), self.batched, self.max_queue
+
+    def _put(self, command: "UIActor._Command") -> Future:
+        with self._cond:
+            if self._stopping:
+                command.future.set_exception(RuntimeError("UI线程已停止"))
+                return command.future
+            heapq.heappush(self._heap, command)
+            self.max_queue = max(self.max_queue, len(self._heap))
+            self._cond.notify()
+        return command.future
+
+    def _next(self) -> Optional[List["UIActor._Command"]]:
+        """取出下一批要执行的命令（发送命令可能合并为多条）"""
+        with self._cond:
+            while not self._heap:
+                if self._stopping:
+                    return None
+                self._cond.wait()
+
+            command = self._heap[0]
+            if command.priority == self.PRIORITY_SEND and self._sends_since_poll >= self.sends_between_polls:
+                # 发送太多时让等待中的轮询先执行，避免新消息迟迟检测不到
+                polls = [c for c in self._heap if c.priority == self.PRIORITY_POLL]
+                if polls:
+                    command = min(polls)
+            self._heap.remove(command)
+
+            batch = [command]
+            if command.priority == self.PRIORITY_SEND:
+                same_chat = sorted(c for c in self._heap if c.priority == self.PRIORITY_SEND and c.chat is command.chat)
+                for extra in same_chat[:max(self.batch_max - 1, 0)]:
+                    self._heap.remove(extra)
+                    batch.append(extra)
+                self._sends_since_poll += 1
+            elif command.priority == self.PRIORITY_POLL:
+                self._sends_since_poll = 0
+            heapq.heapify(self._heap)
+            return batch
+
+    def _run(self):
+        # Windows下UI自动化（COM）需要在每个线程内单独初始化
+        try:
+            import uiautomation
+            initializer = uiautomation.UIAutomationInitializerInThread()
+        except Exception:
+            initializer = contextlib.nullcontext()
+
+        with initializer:
+            while True:
+                batch = self._next()
+                if batch is None:
+                    return
+                start = time.perf_counter()
+                try:
+                    head = batch[0]
+                    if head.priority == self.PRIORITY_SEND:
+                        head.chat.SendMsg("\n".join(c.text for c in batch))
+                        result = None
+                    else:
+                        result = head.func(*head.args, **head.kwargs)
+                except BaseException as e:
+                    for c in batch:
+                        c.future.set_exception(e)
+                else:
+                    for c in batch:
+                        c.future.set_result(result)
+                finally:
+                    self.busy_time += time.perf_counter() - start
+                    self.executed += 1
+                    self.batched += len(batch) - 1
+
+class LatencyTracker:
+    """保存最近的延迟样本并计算分位数"""
+
+    def __init__(self, maxlen: int = 1000):
+        self.samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def __len__(self):
+        return len(self.samples)
+
+class HedgeController:
+    """对冲请求的等待时间、频率上限和效果统计"""
+
     def __init__(self):
-        self.log = []
-        
-    def add_entry(self, sender: str, message: str, reply: str, error: Optional[str] = None):
-        """添加日志条目"""
+        self.primary = LatencyTracker()     # 主请求自身的首包延迟（即不对冲时的延迟）
+        self.effective = LatencyTracker()   # 实际拿到响应的延迟（对冲后）
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        """主请求等待多久没有响应就发出对冲请求"""
+        if len(self.primary) < Config.HEDGE_MIN_SAMPLES:
+            return Config.HEDGE_MAX_DELAY
+        value = self.primary.percentile(Config.HEDGE_PERCENTILE)
+        return min(max(value, Config.HEDGE_MIN_DELAY), Config.HEDGE_MAX_DELAY)
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def can_hedge(self) -> bool:
+        """按比例上限决定本次能否对冲"""
+        with self._lock:
+            return self.hedged + 1 <= Config.HEDGE_MAX_RATE * self.requests
+
+    def count_hedge(self):
+        with self._lock:
+            self.hedged += 1
+
+    def count_win(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = {"requests": self.requests, "hedged": self.hedged, "hedge_wins": self.hedge_wins}
+        counts["p99_with"] = self.effective.percentile(99)
+        counts["p99_without"] = self.primary.percentile(99)
+        return counts
+
+class ChatLogger:
+    """聊天日志记录器：每条对话实时追加到轮转的JSONL文件，缓冲写入并定期fsync"""
+
+    FILE_PREFIX = "chat_log_"
+
+    def __init__(self,
+                 log_dir: Optional[str] = None,
+                 max_bytes: Optional[int] = None,
+                 max_files: Optional[int] = None,
+                 flush_interval: Optional[float] = None,
+                 flush_every: Optional[int] = None):
+        flush_interval = Config.CHAT_LOG_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.log_dir = Config.CHAT_LOG_DIR if log_dir is None else log_dir
+        self.max_bytes = Config.CHAT_LOG_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_files = Config.CHAT_LOG_MAX_FILES if max_files is None else max_files
+        self.flush_every = Config.CHAT_LOG_FLUSH_EVERY if flush_every is None else flush_every
+        self.count = 0
+        self._pending = 0
+        self._bytes = 0                 # 当前文件已写入的字节数（自行计数，tell()会冲刷缓冲区）
+        self._lock = threading.Lock()
+        self._file = None
+        self.path = None
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._open_new_file()
+
+        # 后台定期落盘，空闲时缓冲区里的记录也不会滞留
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, args=(flush_interval,), daemon=True)
+        self._flusher.start()
+
+    def add_entry(self, sender: str, message: str, reply: str, error: Optional[str] = None,
+                  chat: Optional[str] = None, latency: Optional[float] = None,
+                  api_latency: Optional[float] = None, prompt_tokens: Optional[int] = None,
+                  completion_tokens: Optional[int] = None, route: str = "llm"):
+        """追加一条日志记录（route: llm / fast_path / ignored）"""
         entry = {
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "chat": chat,
             "sender": sender,
             "message": message,
             "reply": reply,
-            "error": error
+            "error": error,
+            "latency": round(latency, 3) if latency is not None else None,
+            "api_latency": round(api_latency, 3) if api_latency is not None else None,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "route": route
         }
-        self.log.append(entry)
-        # console.print(f"[dim]📝 已记录：{entry}[/]")
-        
-    def save_to_file(self):
-        """保存日志到TXT文件，文件名包含结束时间"""
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
         try:
-            # 获取当前脚本文件的目录
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            
-            # 动态生成日志文件名
-            end_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-            log_file_name = f"chat_log_{end_time}.txt"
-            
-            # 构建完整路径
-            log_file_path = os.path.join(current_dir, log_file_name)
-            
-            # 写入日志文件
-            with open(log_file_path, "w", encoding="utf-8") as f:
-                f.write("微信智能助手对话日志\n")
-                f.write(f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write("=" * 50 + "\n\n")
-                
-                for i, entry in enumerate(self.log, 1):
-                    f.write(f"对话记录 #{i}\n")
-                    f.write(f"时间: {entry['timestamp']}\n")
-                    f.write(f"发送者: {entry['sender']}\n")
-                    f.write(f"原始消息: {entry['message']}\n")
-                    f.write(f"回复内容: {entry['reply']}\n")
-                    f.write("-" * 50 + "\n")
-                    
-            console.print(f"[green]✅ 日志已保存至 {log_file_path}[/]")
+            with self._lock:
+                if self._file is None:
+                    logging.warning("聊天日志已关闭，丢弃记录: %s", line.rstrip())
+                    return
+                self._file.write(line)
+                self._bytes += len(line.encode("utf-8"))
+                self.count += 1
+                self._pending += 1
+                if self._pending >= self.flush_every:
+                    self._sync()
+                if self._bytes >= self.max_bytes:
+                    self._rotate()
+        except Exception as e:
+            logging.exception("写入聊天日志失败")
+            console.print(f"[red]❌ 写入聊天日志失败: {str(e)}[/]")
+
+    def search(self, keyword: Optional[str] = None, sender: Optional[str] = None,
+               chat: Optional[str] = None, since: Optional[str] = None,
+               until: Optional[str] = None, limit: Optional[int] = 100):
+        """逐行扫描历史日志，按条件返回匹配记录（生成器，不会把日志整体读入内存）
+
+        since/until 使用与记录相同的 "%Y-%m-%d %H:%M:%S" 格式"""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+        found = 0
+        for path in self._log_files():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue  # 崩溃时可能留下半行
+                        if sender and entry.get("sender") != sender:
+                            continue
+                        if chat and entry.get("chat") != chat:
+                            continue
+                        if since and entry.get("timestamp", "") < since:
+                            continue
+                        if until and entry.get("timestamp", "") > until:
+                            continue
+                        if keyword and keyword not in (entry.get("message") or "") \
+                                and keyword not in (entry.get("reply") or ""):
+                            continue
+                        yield entry
+                        found += 1
+                        if limit is not None and found >= limit:
+                            return
+            except OSError as e:
+                logging.warning("读取聊天日志失败 %s: %s", path, str(e))
+
+    def close(self):
+        """停止后台落盘并关闭日志文件"""
+        self._stop.set()
+        try:
+            with self._lock:
+                if self._file is not None:
+                    self._sync()
+                    self._file.close()
+                    self._file = None
+            console.print(f"[green]✅ 本次共记录 {self.count} 条对话，日志目录 {self.log_dir}[/]")
         except Exception as e:
             console.print(f"[red]❌ 日志保存失败: {str(e)}[/]")
 
+    def _flush_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                with self._lock:
+                    if self._file is not None and self._pending:
+                        self._sync()
+            except Exception:
+                logging.exception("聊天日志落盘失败")
+
+    def _sync(self):
+        """把缓冲区写入磁盘（调用方需持有锁）"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def _open_new_file(self):
+        name = f"{self.FILE_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl"
+        self.path = os.path.join(self.log_dir, name)
+        self._file = open(self.path, "a", encoding="utf-8", buffering=64 * 1024)
+        self._bytes = os.path.getsize(self.path)
+
+    def _rotate(self):
+        """当前文件写满后切换到新文件，并清理过旧的日志（调用方需持有锁）"""
+        self._sync()
+        self._file.close()
+        self._open_new_file()
+        files = self._log_files()
+        for old in files[:max(len(files) - self.max_files, 0)]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def _log_files(self) -> List[str]:
+        """按时间顺序列出日志目录下的所有日志文件"""
+        try:
+            names = sorted(n for n in os.listdir(self.log_dir)
+                           if n.startswith(self.FILE_PREFIX) and n.endswith(".jsonl"))
+        except OSError:
+            return []
+        return [os.path.join(self.log_dir, n) for n in names]
+
 # ====================
 # 核心功能模块
 # ====================
@@ -271,20 +1082,52 @@ class WeChatAssistant:
     """微信智能助手主程序"""
     
     def __init__(self):
-        # 加载知识库并检查Token
-        self.knowledge, self.knowledge_tokens = KnowledgeManager.load_folder()
-        
-        if self.knowledge_tokens == 0:
-            console.print("[yellow]⚠️ 知识库为空，将仅使用基础模型[/]")
-        elif self.knowledge_tokens > Config.MAX_TOKENS:
-            console.print(f"[red]❌ 知识库Token数超过限制 ({self.knowledge_tokens}/{Config.MAX_TOKENS})[/]")
-            sys.exit(1)  
+        # 知识库在后台逐个文件加载，加载期间已就绪的部分即可参与回答
+        self.knowledge, self.knowledge_tokens = "", 0
+        self.knowledge_files = 0
+        self.knowledge_ready = threading.Event()
+        self.fatal_error: Optional[str] = None
+        self.wx = None
+        threading.Thread(target=self._load_knowledge_background, daemon=True).start()
+
         self.logger = ChatLogger()
+        self.memory = ConversationMemory()
+        self.poller = PollScheduler()
+        self.hedge = HedgeController()
+        self.fast_path = FastPathRules() if Config.FAST_PATH_ENABLED else None
         self.last_received = "暂无消息"
         self.last_reply = "暂无回复"
-        self.lock = threading.Lock()
+        self.ui = UIActor()
+        self._handlers: List[threading.Thread] = []   # 处理中的消息线程，退出前等待其完成
         
         
+    def _load_knowledge_background(self):
+        """后台加载知识库，每读完一个文件就更新可用知识"""
+        start = time.perf_counter()
+        combined: List[str] = []
+        total_tokens = 0
+        try:
+            for file_path, content, tokens in KnowledgeManager.iter_folder():
+                if total_tokens + tokens > Config.MAX_TOKENS:
+                    self.fatal_error = f"知识库Token超过限制 ({total_tokens + tokens}/{Config.MAX_TOKENS})"
+                    console.print(f"[red]❌ {self.fatal_error}[/]")
+                    return
+                total_tokens += tokens
+                combined.append(KnowledgeManager.format_source(file_path, content))
+                self.knowledge, self.knowledge_tokens = "\n\n".join(combined), total_tokens
+                self.knowledge_files += 1
+                logging.info("知识库已加载 %s: %d tokens", os.path.basename(file_path), tokens)
+
+            if total_tokens == 0:
+                console.print("[yellow]⚠️ 知识库为空，将仅使用基础模型[/]")
+            logging.info("知识库加载完成：%d个文件，%d tokens，耗时 %.2fs",
+                         self.knowledge_files, total_tokens, time.perf_counter() - start)
+        except Exception as e:
+            logging.exception("加载知识库失败")
+            console.print(f"[red]❌ 加载知识库失败: {str(e)}[/]")
+        finally:
+            self.knowledge_ready.set()
+
     def _load_knowledge(self) -> str:
         """整合所有知识源"""
         combined = []
@@ -294,8 +1137,12 @@ class WeChatAssistant:
                 combined.append(f"【知识来源：{os.path.basename(source)}】\n{content}")
         return "\n\n".join(combined)
     
-    def _call_ai_api(self, prompt: str) -> str:
-        """调用大语言模型API"""
+    def _call_ai_api(self, prompt: str, chat_name: Optional[str] = None,
+                     on_segment: Optional[Callable[[str], None]] = None,
+                     usage: Optional[dict] = None) -> str:
+        """调用大语言模型API（传入chat_name时携带该会话的历史记忆，
+        传入on_segment时以流式生成，每凑齐一句就回调发送，
+        传入usage字典时写回Token用量和接口耗时）"""
         # console.print(f"[blue]🤖 生成回复中 | 输入Token: {KnowledgeManager.calculate_tokens(prompt)}[/]")
 
         system_prompt = f"""请根据以下知识库回答问题（如果问题超出知识库范围，可以结合常识进行推理回答）：
@@ -314,14 +1161,17 @@ class WeChatAssistant:
             "Content-Type": "application/json"
         }'''
         
+        history = self.memory.get_messages(chat_name) if chat_name else []
         data = {
             "model": "deepseek-ai/DeepSeek-V3",
             "messages": [
                 {"role": "system", "content": system_prompt},
+                *history,
                 {"role": "user", "content": prompt}
             ],
             "temperature": 0.3,
-            "max_tokens": 300
+            "max_tokens": 300,
+            "stream": on_segment is not None
         }
         
         # 指数退避重试逻辑
@@ -331,29 +1181,36 @@ class WeChatAssistant:
 
         try:
             while retries < Config.API_MAX_RETRIES:
-                headers = APIClient.get_auth_header()
-                headers["Content-Type"] = "application/json"
+                key = None
+                status = None
+                start = time.time()
 
                 try:
-                    response = requests.post(
-                        Config.API_URL,
-                        headers=headers,
-                        json=data,
-                        timeout=45
-                    )
-                    response.raise_for_status()
-                    return response.json()["choices"][0]["message"]["content"]
+                    opened = self._open_response(data, stream=on_segment is not None)
+                    if opened is None:
+                        last_status = "NO_AVAILABLE_KEY"
+                        break
+                    response, key, start = opened
+                    result_usage = {}
+                    if on_segment is not None:
+                        reply = self._read_stream(response, on_segment, result_usage)
+                    else:
+                        result = response.json()
+                        reply = result["choices"][0]["message"]["content"]
+                        result_usage = result.get("usage") or {}
+                    status = 200
+                    self._record_reply(chat_name, prompt, reply, result_usage, usage, time.time() - start)
+                    return reply
 
                 except requests.exceptions.HTTPError as e:
                     status_code = e.response.status_code
-                    last_status = status_code
-                    
-                    # 需要切换KEY的错误
-                    if status_code in Config.API_KEY_ROTATE_CODES:
-                        APIClient.rotate_key()
-                    
-                    # 需要重试的错误
-                    if status_code in Config.API_RETRY_STATUS_CODES:
+                    status = last_status = status_code
+
+                    # 被限流的KEY会进入冷却、失效的KEY会被移除，重试时自动换用其他KEY
+                    if status_code in Config.API_KEY_DISABLE_CODES or status_code == 429:
+                        logging.warning("API KEY返回 %d, %d/%d次重试...", status_code, retries+1, Config.API_MAX_RETRIES)
+                        retries += 1
+                    elif status_code in Config.API_RETRY_STATUS_CODES:
                         logging.warning("API错误 %d, %d/%d次重试...", status_code, retries+1, Config.API_MAX_RETRIES)
                         time.sleep(delay)
                         delay *= 2  # 指数退避
@@ -365,11 +1222,16 @@ class WeChatAssistant:
                         requests.exceptions.Timeout) as e:
                     logging.warning("网络错误: %s, %d/%d次重试...", 
                                  str(e), retries+1, Config.API_MAX_RETRIES)
-                    last_status = "NETWORK_ERROR"  # 标记网络错误
+                    status = last_status = "NETWORK_ERROR"  # 标记网络错误
                     time.sleep(delay)
                     delay *= 2
                     retries += 1
 
+                finally:
+                    # 建立连接失败时KEY已在_open_response中归还，这里只归还读取响应的KEY
+                    if key is not None:
+                        key_pool.release(key, status, time.time() - start)
+
             # 重试结束后使用 last_status
             if last_status is not None:
                 logging.error("所有重试失败，最终状态码: %s", last_status)
@@ -382,16 +1244,195 @@ class WeChatAssistant:
             logging.exception("API调用失败")
             return None
 
+    @staticmethod
+    def _post(key: "APIKeyPool._KeyState", data: dict, stream: bool):
+        """用指定KEY发出请求，返回状态正常的响应"""
+        response = requests.post(
+            Config.API_URL,
+            headers={
+                "Authorization": f"Bearer {key.key}",
+                "Content-Type": "application/json"
+            },
+            json=data,
+            timeout=45,
+            stream=stream
+        )
+        response.raise_for_status()
+        return response
+
+    @staticmethod
+    def _failure_status(error: Exception):
+        if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            return error.response.status_code
+        return "NETWORK_ERROR"
+
+    def _open_response(self, data: dict, stream: bool):
+        """取得KEY并发出请求，返回（响应，KEY，开始时间）；没有可用KEY时返回None
+
+        启用对冲时，主请求超过分位数延迟仍无响应，就用另一个KEY（可换模型）再发一份，
+        先成功的为准，落后的一份在后台收尾（关闭响应、归还KEY）。失败时KEY已归还"""
+        primary_key = key_pool.acquire()
+        if primary_key is None:
+            return None
+        self.hedge.count_request()
+        start = time.time()
+
+        if not Config.HEDGE_ENABLED:
+            try:
+                response = self._post(primary_key, data, stream)
+            except Exception as e:
+                key_pool.release(primary_key, self._failure_status(e), time.time() - start)
+                raise
+            elapsed = time.time() - start
+            self.hedge.primary.record(elapsed)
+            self.hedge.effective.record(elapsed)
+            return response, primary_key, start
+
+        results: Queue = Queue()
+
+        def attempt(key, payload, is_primary):
+            try:
+                results.put((key, self._post(key, payload, stream), None, is_primary))
+            except Exception as e:
+                results.put((key, None, e, is_primary))
+
+        threading.Thread(target=attempt, args=(primary_key, data, True), daemon=True).start()
+        outstanding = 1
+        hedged = False
+        try:
+            first = results.get(timeout=self.hedge.delay())
+        except Empty:
+            first = None
+            hedge_key = key_pool.acquire(timeout=0, exclude=(primary_key.key,)) if self.hedge.can_hedge() else None
+            if hedge_key is not None:
+                self.hedge.count_hedge()
+                payload = dict(data, model=Config.HEDGE_MODEL) if Config.HEDGE_MODEL else data
+                threading.Thread(target=attempt, args=(hedge_key, payload, False), daemon=True).start()
+                outstanding += 1
+                hedged = True
+                logging.info("主请求 %.1fs 未响应，已用 %s 发出对冲请求", time.time() - start, hedge_key.label)
+
+        winner = None
+        first_error = None
+        while winner is None and outstanding:
+            key, response, error, is_primary = first if first is not None else results.get()
+            first = None
+            outstanding -= 1
+            elapsed = time.time() - start
+            if error is None:
+                winner = (response, key, start)
+                self.hedge.effective.record(elapsed)
+                if is_primary:
+                    self.hedge.primary.record(elapsed)
+                else:
+                    self.hedge.count_win()
+            else:
+                key_pool.release(key, self._failure_status(error), elapsed)
+                if is_primary and hedged:
+                    # 已发出对冲的主请求最终失败也是不对冲时的真实延迟，漏记会低估长尾
+                    self.hedge.primary.record(elapsed)
+                if first_error is None or is_primary:
+                    first_error = error
+
+        if outstanding:
+            threading.Thread(target=self._finish_hedge_loser, args=(results, start), daemon=True).start()
+        if winner is None:
+            raise first_error
+        return winner
+
+    def _finish_hedge_loser(self, results: Queue, start: float):
+        """等待落后的请求结束：关闭响应并归还KEY，主请求的实际延迟（包括失败前耗时）仍计入统计"""
+        key, response, error, is_primary = results.get()
+        elapsed = time.time() - start
+        if is_primary:
+            self.hedge.primary.record(elapsed)
+        if error is not None:
+            key_pool.release(key, self._failure_status(error), elapsed)
+            return
+        response.close()
+        key_pool.release(key, "CANCELLED", elapsed)
+
+    def _record_reply(self, chat_name: Optional[str], prompt: str, reply: str,
+                      result_usage: dict, usage: Optional[dict], api_latency: float):
+        """记录成功回复的用量和对话记忆；这里出错不能影响已拿到的回复，更不能触发重试"""
+        try:
+            if usage is not None:
+                usage["api_latency"] = api_latency
+                usage["prompt_tokens"] = result_usage.get("prompt_tokens")
+                usage["completion_tokens"] = result_usage.get("completion_tokens") \
+                    or KnowledgeManager.calculate_tokens(reply)
+            if chat_name:
+                self.memory.add_turn(chat_name, prompt, reply)
+        except Exception:
+            logging.exception("记录回复用量/对话记忆失败")
+
+    def _read_stream(self, response, on_segment: Callable[[str], None],
+                     usage: Optional[dict] = None) -> str:
+        """读取SSE流，按句回调发送，返回完整回复（接口返回用量时写入usage）"""
+        segmenter = SentenceSegmenter()
+        parts: List[str] = []
+        sent = 0
+        try:
+            # 按字节切行再以UTF-8解码：接口未声明charset时，按文本切行会把中文字节误判为换行
+            for raw in response.iter_lines():
+                line = raw.decode("utf-8", errors="replace") if isinstance(raw, bytes) else raw
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                chunk = json.loads(payload)
+                if usage is not None and chunk.get("usage"):
+                    usage.update(chunk["usage"])
+                choices = chunk.get("choices") or []
+                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                if not delta:
+                    continue
+                parts.append(delta)
+                for segment in segmenter.feed(delta):
+                    on_segment(segment)
+                    sent += 1
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            # 已经发出部分内容时不能整体重试，否则用户会收到重复消息
+            if not sent:
+                raise requests.exceptions.ConnectionError(str(e)) from e
+            logging.warning("流式响应中断，已发送%d段: %s", sent, str(e))
+        finally:
+            response.close()
+
+        tail = segmenter.flush()
+        if tail:
+            on_segment(tail)
+        return "".join(parts).strip()
+
     def _handle_message(self, chat, msg):
         """添加详细日志和异常处理"""
         try:
             console.print(f"[red]🔥 收到消息调试标记[/]")
+            received_at = time.time()
             sender = msg.sender
             message = msg.content
             # console.print(f"\n[cyan]📩 新消息 @{datetime.now().strftime('%H:%M:%S')}[/]")
             # console.print(f"发件人: {sender}\n内容: {message}\n")
             
-            reply = self._call_ai_api(message)
+            chat_name = getattr(chat, "who", str(chat))
+            if self.fast_path is not None and self._try_fast_path(chat, chat_name, sender, message, received_at):
+                return
+            sent_segments: List[str] = []
+
+            send_futures: List[Future] = []
+
+            def send_segment(segment: str):
+                # 只提交不等待，继续读取后续内容；同一会话的消息由UI线程按顺序发送
+                send_futures.append(self.ui.send(chat, segment))
+                sent_segments.append(segment)
+
+            usage: dict = {}
+            reply = self._call_ai_api(message, chat_name,
+                                      on_segment=send_segment if Config.STREAM_REPLY else None,
+                                      usage=usage)
             error = None if reply else "API调用失败"
 
             if error:
@@ -401,19 +1442,52 @@ class WeChatAssistant:
             #console.print(f"[green]💬 生成回复:\n{reply}[/]")
             
             # 发送消息
-            with self.lock:
-                chat.SendMsg(reply)
-                # console.print(f"[green]📨 已发送回复 @{datetime.now().strftime('%H:%M:%S')}[/]")
-                self.logger.add_entry(sender, message, reply, error=error)
-                message_queue.put((f"[{sender}] {message}", reply))
+            if not sent_segments:  # 流式模式下已逐句发送
+                send_futures.append(self.ui.send(chat, reply))
+            for future in send_futures:
+                future.result(Config.UI_CALL_TIMEOUT)
+            # console.print(f"[green]📨 已发送回复 @{datetime.now().strftime('%H:%M:%S')}[/]")
+            self.logger.add_entry(sender, message, reply, error=error, chat=chat_name,
+                                  latency=time.time() - received_at,
+                                  api_latency=usage.get("api_latency"),
+                                  prompt_tokens=usage.get("prompt_tokens"),
+                                  completion_tokens=usage.get("completion_tokens"))
+            message_queue.put((f"[{sender}] {message}", reply))
+            self.poller.notify_activity()
             
         except Exception as e:
             logging.exception("消息处理异常")
             import traceback
             traceback.print_exc()
 
-    def _setup_ui(self) -> Layout:
+    def _try_fast_path(self, chat, chat_name: str, sender: str, message: str, received_at: float) -> bool:
+        """命中快速通道时直接回复或忽略，返回是否已处理"""
+        matched, reply = self.fast_path.match(message)
+        if not matched:
+            return False
+
+        # 估算节省的输入Token：知识库 + 对话记忆 + 消息本身
+        try:
+            history = self.memory.get_messages(chat_name)
+            saved = self.knowledge_tokens + KnowledgeManager.calculate_tokens(
+                message + "".join(m["content"] for m in history))
+        except Exception:
+            saved = self.knowledge_tokens
+        self.fast_path.record(reply, saved)
+
+        if reply is not None:
+            self.ui.send(chat, reply).result(Config.UI_CALL_TIMEOUT)
+        self.logger.add_entry(sender, message, reply, chat=chat_name,
+                              latency=time.time() - received_at,
+                              route="fast_path" if reply is not None else "ignored")
+        if reply is not None:
+            message_queue.put((f"[{sender}] {message}", reply))
+            self.poller.notify_activity()
+        return True
+
+    def _setup_ui(self) -> "Layout":
         """初始化终端界面布局"""
+        from rich.layout import Layout
         layout = Layout()
         layout.split(
             Layout(name="header", size=3),
@@ -426,8 +1500,12 @@ class WeChatAssistant:
         )
         return layout
 
-    def _update_ui(self, layout: Layout, start_time: float):
+    def _update_ui(self, layout: "Layout", start_time: float):
         """刷新终端界面显示"""
+        from rich.panel import Panel
+        from rich.progress import Progress
+        from rich.text import Text
+
         # Header
         elapsed = time.time() - start_time
         remaining = Config.MAX_DURATION - elapsed
@@ -445,9 +1523,28 @@ class WeChatAssistant:
         status_content = Text()
         status_content.append(f"当前时间: {datetime.now().strftime('%H:%M:%S')}\n", style="yellow")
         status_content.append(f"监听窗口: {', '.join(Config.LISTEN_NAMES)}\n")
-        file_count = KnowledgeManager.count_files()
-        status_content.append(f"知识库来源: {file_count}个文件\n")
+        loading = "" if self.knowledge_ready.is_set() else "（加载中）"
+        status_content.append(f"知识库来源: {self.knowledge_files}个文件{loading}\n")
         status_content.append(f"知识库Token: {self.knowledge_tokens}/{Config.MAX_TOKENS}\n")
+        memory_chats, memory_tokens = self.memory.stats()
+        status_content.append(f"对话记忆: {memory_chats}个会话 / {memory_tokens} tokens\n")
+        if self.fast_path is not None:
+            hits, ignored, saved = self.fast_path.stats()
+            status_content.append(f"快速通道: 节省LLM调用 {hits} 次（忽略 {ignored}）| 约 {saved} tokens\n")
+        for key in key_pool.stats():
+            latency = f"{key['latency']:.1f}s" if key["latency"] is not None else "-"
+            status_content.append(f"{key['label']}: {key['status']} | 并发 {key['in_flight']} | "
+                                  f"成功率 {key['success_rate']:.0%} | 延迟 {latency}\n")
+        if Config.HEDGE_ENABLED:
+            hedge = self.hedge.stats()
+            with_hedge = f"{hedge['p99_with']:.1f}s" if hedge["p99_with"] is not None else "-"
+            without_hedge = f"{hedge['p99_without']:.1f}s" if hedge["p99_without"] is not None else "-"
+            status_content.append(f"对冲请求: {hedge['hedged']}/{hedge['requests']}（胜出 {hedge['hedge_wins']}）| "
+                                  f"P99首包 对冲后 {with_hedge} / 不对冲 {without_hedge}\n")
+        queued, batched, max_queue = self.ui.stats()
+        status_content.append(f"UI队列: {queued} 条排队（峰值 {max_queue}）| 合并发送 {batched} 次\n")
+        interval, avg_latency, p95_latency = self.poller.stats()
+        status_content.append(f"轮询间隔: {interval:.1f}s | 检测延迟 均值 {avg_latency:.2f}s / P95 {p95_latency:.2f}s\n")
         layout["status"].update(Panel(status_content, title="系统状态"))
 
         # Footer
@@ -455,27 +1552,58 @@ class WeChatAssistant:
         progress.add_task("[cyan]运行进度", total=Config.MAX_DURATION, completed=elapsed)
         layout["footer"].update(Panel(progress, title="运行进度")) 
 
+    @staticmethod
+    def _import_ui_libs():
+        import pyautogui  # noqa: F401
+        import wxauto  # noqa: F401
+
+    @staticmethod
+    def _connect_wechat():
+        from wxauto import WeChat
+        return WeChat()
+
+    def _lock_window(self, name: str):
+        """打开并锁定监听窗口（在UI线程中执行）"""
+        import pyautogui
+        self.wx.ChatWith(who=name)
+        current_x, current_y = pyautogui.position()
+        pyautogui.moveTo(current_x, current_y - 30)
+        pyautogui.doubleClick()
+        self.wx.AddListenChat(who=name)
+
     def run(self):
         """启动主程序"""
+        # 到真正开始运行时才连接微信；所有UI自动化操作都在UI线程中执行
+        self.ui.start()
+        self.ui.call(self._import_ui_libs)
+        startup_timer.mark("加载UI自动化库")
+        self.wx = wx = self.ui.call(self._connect_wechat)
+        startup_timer.mark("连接微信客户端")
+
         # 初始化监听
         for name in Config.LISTEN_NAMES:
             try:
-                wx.ChatWith(who=name)
-                current_x, current_y = pyautogui.position()
-                pyautogui.moveTo(current_x, current_y - 30)
-                pyautogui.doubleClick()
-                wx.AddListenChat(who=name)
+                self.ui.call(self._lock_window, name)
                 console.print(f"[green]✅ 已锁定窗口: {name}[/]")
             except Exception as e:
                 console.print(f"[red]❌ 窗口初始化失败: {name} - {str(e)}[/]")
 
+        startup_timer.mark("锁定监听窗口")
+        console.print(f"[green]🚀 {startup_timer.report()}[/]")
+        logging.info(startup_timer.report())
+
         # 准备UI
+        from rich.live import Live
         ui_layout = self._setup_ui()
         start_time = time.time()
 
-        with Live(ui_layout, refresh_per_second=2, screen=True):
+        live = Live(ui_layout, refresh_per_second=2, screen=True) if Config.SHOW_DASHBOARD else contextlib.nullcontext()
+        with live:
             while (time.time() - start_time) < Config.MAX_DURATION:
                 try:
+                    if self.fatal_error:
+                        break
+
                     # 更新最后的消息记录
                     if not message_queue.empty():
                         self.last_received, self.last_reply = message_queue.get()
@@ -484,7 +1612,8 @@ class WeChatAssistant:
                     self._update_ui(ui_layout, start_time)
 
                     # 检查新消息
-                    msgs = wx.GetListenMessage()
+                    msgs = self.ui.call(wx.GetListenMessage, priority=UIActor.PRIORITY_POLL)
+                    self.poller.record_poll(sum(len(msgs[chat]) for chat in msgs))
                     for chat in msgs:
                         for msg in msgs[chat]:
                             if msg.type == 'friend':
@@ -493,8 +1622,10 @@ class WeChatAssistant:
                                     args=(chat, msg)
                                 )
                                 thread.start()
+                                self._handlers.append(thread)
+                    self._handlers = [t for t in self._handlers if t.is_alive()]
 
-                    time.sleep(Config.CHECK_INTERVAL)
+                    self.poller.wait()
                 
                 except KeyboardInterrupt:
                     console.print("[yellow]⏹️ 用户手动终止[/]")
@@ -503,20 +1634,53 @@ class WeChatAssistant:
                     console.print(f"[red]⚠️ 异常: {str(e)}[/]")
                     time.sleep(1)
 
+        # 等待已生成的回复发送并记录完毕，再停止UI线程和日志
+        self._drain_handlers(Config.SHUTDOWN_DRAIN_TIMEOUT)
+
         # 保存日志
-        self.logger.save_to_file()
+        interval, avg_latency, p95_latency = self.poller.stats()
+        logging.info("消息检测延迟 均值 %.2fs / P95 %.2fs（样本数 %d）", avg_latency, p95_latency, len(self.poller.latencies))
+        self.ui.stop()
+        if Config.HEDGE_ENABLED:
+            logging.info("对冲请求统计: %s", self.hedge.stats())
+        if self.fast_path is not None:
+            hits, ignored, saved = self.fast_path.stats()
+            console.print(f"[green]⚡ 快速通道共节省 {hits} 次大模型调用（其中忽略 {ignored} 条），约 {saved} tokens[/]")
+            logging.info("快速通道节省 %d 次大模型调用（忽略 %d 条），约 %d tokens", hits, ignored, saved)
+        self.logger.close()
+        if self.fatal_error:
+            console.print(f"[red]❌ 服务异常停止: {self.fatal_error}[/]")
+            return
         console.print(f"[green]⏰ 服务已安全停止，累计运行 {Config.MAX_DURATION}秒[/]")
 
+    def _drain_handlers(self, timeout: float):
+        """等待处理中的消息线程结束，超时后放弃等待"""
+        deadline = time.time() + timeout
+        pending = [t for t in self._handlers if t.is_alive()]
+        if pending:
+            console.print(f"[yellow]⏳ 等待 {len(pending)} 条处理中的消息完成…[/]")
+        for thread in pending:
+            thread.join(max(deadline - time.time(), 0))
+        unfinished = sum(t.is_alive() for t in pending)
+        if unfinished:
+            logging.warning("退出时仍有 %d 条消息未处理完（等待超过 %ss）", unfinished, timeout)
+
 # ====================
 # 程序启动
 # ====================
 if __name__ == "__main__":
-    try:
-        # 检查tiktoken依赖
-        import tiktoken
-    except ImportError:
+    # 检查tiktoken依赖（只查找不导入，导入放到后台进行）
+    import importlib.util
+    if importlib.util.find_spec("tiktoken") is None:
         console.print("[red]❌ 需要安装tiktoken库：pip install tiktoken[/]")
         sys.exit(1)
 
+    config_errors = Config.validate()
+    if config_errors:
+        console.print(f"[red]❌ 配置错误: {'; '.join(config_errors)}[/]")
+        sys.exit(1)
+    startup_timer.mark("导入与配置检查")
+
     assistant = WeChatAssistant()
+    startup_timer.mark("初始化助手")
     assistant.run()
@@ -0,0 +1,335 @@
+# ====================
+# 微信助手回放压测：用 fake_wxauto 替身代替微信客户端、用本地桩服务代替大模型接口，
+# 驱动 wechat agent 3.0.py 的真实主循环/线程/发送路径，统计回复延迟分位数、吞吐、
+# 丢失与乱序回复，以及峰值线程数和内存
+#
+# 示例：
+#   python wechat_agent_loadtest.py --groups 20 --rate 0.2 --duration 60
+#   python wechat_agent_loadtest.py --trace chat_logs/chat_log_xxx.jsonl --speed 5
+# ====================
+import argparse
+import ast
+import importlib.util
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import fake_wxauto
+
+AGENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wechat agent 3.0.py")
+MARK = re.compile(r"#(\d+)")
+
+
+# ====================
+# 大模型接口桩
+# ====================
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """兼容 /v1/chat/completions 的桩接口：按配置的延迟返回带消息编号的回复，支持SSE流式"""
+
+    latency = 1.0           # 平均首包延迟（秒）
+    jitter = 0.5            # 对数正态抖动的 sigma
+    token_delay = 0.02      # 流式输出时每个分块的间隔（秒）
+    error_rate = 0.0        # 返回429的概率
+    slow_rate = 0.0         # 命中慢副本的概率
+    slow_factor = 10.0      # 慢副本的延迟倍数
+    requests = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with StubLLMHandler.lock:
+            StubLLMHandler.requests += 1
+
+        if random.random() < self.error_rate:
+            self.send_response(429)
+            self.end_headers()
+            return
+
+        latency = self.latency * random.lognormvariate(0, self.jitter) if self.jitter else self.latency
+        if random.random() < self.slow_rate:
+            latency *= self.slow_factor
+        time.sleep(latency)
+        reply = self._make_reply(body.get("messages") or [])
+
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for i in range(0, len(reply), 4):
+                chunk = {"choices": [{"delta": {"content": reply[i:i + 4]}}]}
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(self.token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+        else:
+            payload = json.dumps({
+                "choices": [{"message": {"role": "assistant", "content": reply}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(reply)}
+            }, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    @staticmethod
+    def _make_reply(messages: List[Dict]) -> str:
+        """每句都带上最近一条用户消息的编号，方便把分段回复对应回原消息"""
+        question = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        found = MARK.findall(question)
+        tag = f"#{found[-1]}" if found else ""
+        return (f"收到你的问题啦{tag}，我来简单说明一下。"
+                f"课程安排和报名方式都可以在群公告里找到{tag}。"
+                f"还有其他问题随时问我哦{tag}！")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_llm(args) -> ThreadingHTTPServer:
+    StubLLMHandler.latency = args.llm_latency
+    StubLLMHandler.jitter = args.llm_jitter
+    StubLLMHandler.token_delay = args.llm_token_delay
+    StubLLMHandler.error_rate = args.llm_error_rate
+    StubLLMHandler.slow_rate = args.llm_slow_rate
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLMHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ====================
+# 资源监控
+# ====================
+class ResourceMonitor(threading.Thread):
+    """定期采样线程数和内存峰值"""
+
+    def __init__(self, interval: float = 0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_rss = None
+        self._stop_event = threading.Event()
+        try:
+            import psutil
+            self._process = psutil.Process()
+        except ImportError:
+            self._process = None
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            if self._process is not None:
+                rss = self._process.memory_info().rss
+                self.peak_rss = max(self.peak_rss or 0, rss)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# ====================
+# 压测主流程
+# ====================
+def load_agent():
+    """按文件路径加载 wechat agent 3.0.py（文件名含空格，无法直接import）"""
+    spec = importlib.util.spec_from_file_location("wechat_agent", AGENT_PATH)
+    agent = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(agent)
+    return agent
+
+
+def percentile(samples: List[float], pct: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def analyze(trace: List[fake_wxauto.FakeMessage], wechat: fake_wxauto.WeChat) -> Dict:
+    """把发送记录对应回原消息，计算延迟、吞吐、丢失和乱序"""
+    by_id = {m.id: m for m in trace if m.type == "friend"}
+    first_reply: Dict[int, float] = {}
+    last_reply: Dict[int, float] = {}
+    pending: Dict[str, List[int]] = {}
+    for m in sorted(by_id.values(), key=lambda m: m.id):
+        if m.arrived_at is not None:
+            pending.setdefault(m.chat, []).append(m.id)
+
+    unmatched = 0
+    for send in sorted(wechat.sent, key=lambda s: s["time"]):
+        # 一次发送可能合并了同一会话的多条回复
+        msg_ids = list(dict.fromkeys(int(i) for i in MARK.findall(send["content"]) if int(i) in by_id))
+        if not msg_ids:
+            # 没有编号的回复（如非大模型生成）按先到先答对应到该群最早未回复的消息
+            queue = [i for i in pending.get(send["chat"], []) if i not in first_reply]
+            if not queue:
+                unmatched += 1
+                continue
+            msg_ids = queue[:1]
+        for msg_id in msg_ids:
+            first_reply.setdefault(msg_id, send["time"])
+            last_reply[msg_id] = send["time"]
+
+    delivered = [m for m in by_id.values() if m.arrived_at is not None]
+    latencies = [first_reply[m.id] - m.arrived_at for m in delivered if m.id in first_reply]
+    complete = [last_reply[m.id] - m.arrived_at for m in delivered if m.id in last_reply]
+    detect = [m.detected_at - m.arrived_at for m in delivered if m.detected_at is not None]
+
+    out_of_order = 0
+    for ids in pending.values():
+        replied = [i for i in ids if i in first_reply]
+        latest = 0.0
+        for i in replied:
+            if first_reply[i] < latest:
+                out_of_order += 1
+            latest = max(latest, first_reply[i])
+
+    window = None
+    if first_reply and delivered:
+        window = max(first_reply.values()) - min(m.arrived_at for m in delivered)
+
+    return {
+        "messages": len(by_id),
+        "delivered": len(delivered),
+        "replied": len(first_reply),
+        "dropped": len(delivered) - len(first_reply),
+        "out_of_order": out_of_order,
+        "sends": len(wechat.sent),
+        "unmatched_sends": unmatched,
+        "throughput_per_s": len(first_reply) / window if window else None,
+        "detect_p50": percentile(detect, 50),
+        "detect_p99": percentile(detect, 99),
+        "first_reply_p50": percentile(latencies, 50),
+        "first_reply_p90": percentile(latencies, 90),
+        "first_reply_p99": percentile(latencies, 99),
+        "first_reply_max": max(latencies) if latencies else None,
+        "full_reply_p50": percentile(complete, 50),
+        "full_reply_p99": percentile(complete, 99),
+        "polls": wechat.poll_count,
+        "concurrent_ui_calls": wechat.concurrent_calls,
+    }
+
+
+def print_report(report: Dict):
+    def fmt(value, unit="s"):
+        return "-" if value is None else (f"{value:.2f}{unit}" if isinstance(value, float) else f"{value}")
+
+    print("\n========== 压测结果 ==========")
+    print(f"消息: {report['messages']}  送达: {report['delivered']}  已回复: {report['replied']}  "
+          f"丢失: {report['dropped']}  乱序: {report['out_of_order']}")
+    print(f"发送次数: {report['sends']}（无法对应: {report['unmatched_sends']}）  "
+          f"吞吐: {fmt(report['throughput_per_s'], ' 条/秒')}")
+    print(f"检测延迟  P50 {fmt(report['detect_p50'])}  P99 {fmt(report['detect_p99'])}  轮询次数 {report['polls']}")
+    print(f"首段回复  P50 {fmt(report['first_reply_p50'])}  P90 {fmt(report['first_reply_p90'])}  "
+          f"P99 {fmt(report['first_reply_p99'])}  最大 {fmt(report['first_reply_max'])}")
+    print(f"完整回复  P50 {fmt(report['full_reply_p50'])}  P99 {fmt(report['full_reply_p99'])}")
+    print(f"LLM请求: {report['llm_requests']}  峰值线程: {report['peak_threads']}  "
+          f"峰值Python内存: {report['peak_traced_mb']:.1f}MB"
+          + (f"  峰值RSS: {report['peak_rss_mb']:.1f}MB" if report.get("peak_rss_mb") else ""))
+    print(f"UI操作并发冲突: {report['concurrent_ui_calls']}")
+    if report.get("hedge"):
+        hedge = report["hedge"]
+        print(f"对冲请求: {hedge['hedged']}/{hedge['requests']}（胜出 {hedge['hedge_wins']}）  "
+              f"P99首包 对冲后 {fmt(hedge['p99_with'])}  不对冲 {fmt(hedge['p99_without'])}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="微信助手回放压测")
+    parser.add_argument("--trace", help="JSONL消息轨迹（可直接使用聊天日志），不传则生成合成轨迹")
+    parser.add_argument("--groups", type=int, default=20, help="合成轨迹的群数量")
+    parser.add_argument("--rate", type=float, default=0.1, help="合成轨迹中每个群每秒的消息数")
+    parser.add_argument("--duration", type=float, default=60, help="合成轨迹时长（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--speed", type=float, default=1.0, help="回放倍速")
+    parser.add_argument("--drain", type=float, default=15, help="消息回放完后继续等待回复的时间（秒）")
+    parser.add_argument("--poll-cost", type=float, default=0.05, help="模拟每次GetListenMessage的耗时（秒）")
+    parser.add_argument("--send-cost", type=float, default=0.1, help="模拟每次SendMsg的耗时（秒）")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="桩接口平均首包延迟（秒）")
+    parser.add_argument("--llm-jitter", type=float, default=0.5, help="桩接口延迟的对数正态sigma")
+    parser.add_argument("--llm-token-delay", type=float, default=0.02, help="桩接口流式分块间隔（秒）")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="桩接口返回429的概率")
+    parser.add_argument("--llm-slow-rate", type=float, default=0.0, help="桩接口请求落到慢副本（延迟x10）的概率")
+    parser.add_argument("--config", action="append", default=[], metavar="NAME=VALUE",
+                        help="覆盖Config配置项，如 --config STREAM_REPLY=False")
+    parser.add_argument("--show-ui", action="store_true", help="显示助手的终端界面")
+    parser.add_argument("--json", help="把结果另存为JSON文件")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> Dict:
+    args = parse_args(argv)
+    tracemalloc.start()
+
+    trace = fake_wxauto.load_trace(args.trace) if args.trace else \
+        fake_wxauto.synthetic_trace(args.groups, args.rate, args.duration, args.seed)
+    for msg in trace:
+        msg.content = f"{msg.content} #{msg.id}"
+    fake_wxauto.install()
+    fake_wxauto.WeChat.defaults = {
+        "trace": trace, "speed": args.speed,
+        "poll_cost": args.poll_cost, "send_cost": args.send_cost,
+    }
+
+    server = start_stub_llm(args)
+    agent = load_agent()
+    workdir = tempfile.mkdtemp(prefix="wechat_loadtest_")
+
+    config = agent.Config
+    config.API_URL = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    config.LISTEN_NAMES = sorted({m.chat for m in trace}) or ["压测群01"]
+    config.KNOWLEDGE_DIR = workdir
+    config.CHAT_LOG_DIR = os.path.join(workdir, "chat_logs")
+    replay_time = (trace[-1].due / args.speed) if trace else 0
+    config.MAX_DURATION = replay_time + args.drain
+    for item in args.config:
+        name, _, value = item.partition("=")
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            pass
+        setattr(config, name.strip(), value)
+    config.SHOW_DASHBOARD = args.show_ui
+    agent.key_pool = agent.APIKeyPool(config.API_KEYS)
+
+    if not args.show_ui:
+        from rich.console import Console
+        agent.console = Console(file=io.StringIO())
+
+    print(f"回放 {len(trace)} 条消息 / {len(config.LISTEN_NAMES)} 个会话，"
+          f"预计 {config.MAX_DURATION:.0f}s，日志目录 {workdir}")
+    monitor = ResourceMonitor()
+    monitor.start()
+    try:
+        assistant = agent.WeChatAssistant()
+        assistant.run()
+    finally:
+        monitor.stop()
+        server.shutdown()
+
+    report = analyze(trace, fake_wxauto.WeChat.last_instance)
+    report["llm_requests"] = StubLLMHandler.requests
+    report["hedge"] = assistant.hedge.stats() if config.HEDGE_ENABLED else None
+    report["peak_threads"] = monitor.peak_threads
+    report["peak_traced_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    report["peak_rss_mb"] = monitor.peak_rss / 1024 / 1024 if monitor.peak_rss else None
+    tracemalloc.stop()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()